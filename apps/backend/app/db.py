@@ -1,6 +1,9 @@
 # backend/app/db.py
+from contextlib import contextmanager
+from typing import Iterator
+
 from sqlalchemy import create_engine, event
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 import os
 
 # DB will live in data/chat.db at project root
@@ -15,14 +18,44 @@ engine = create_engine(
         "check_same_thread": False,
         "timeout": 30,  # reduce "database is locked" errors under concurrent reads/writes
     },
+    # File-backed SQLite uses QueuePool. Size it for the API thread pool, and
+    # hand out the most recently returned connection first so surplus ones
+    # sit idle and get recycled.
+    pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
     pool_pre_ping=True,
+    pool_use_lifo=True,
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: handlers serialize the objects they just wrote, and
+# every column value is set client-side, so reloading them after each commit
+# is a wasted SELECT per object.
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
 
 Base = declarative_base()
 
 
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """
+    Session for work outside a request: commits on success, rolls back on
+    error, and always returns the connection to the pool.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
 @event.listens_for(engine, "connect")
 def set_sqlite_pragma(dbapi_connection, _connection_record):
     """
@@ -1,33 +1,82 @@
-from functools import lru_cache
+import os
+from threading import BoundedSemaphore, Lock
 from typing import List
 
+import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 
 
 EMBEDDING_MODEL = "BAAI/bge-large-en-v1.5"
 EMBEDDING_DIMENSION = 1024
+# 0 keeps torch's default (one intra-op thread per core). Set a small value when
+# serving concurrent requests so parallel encodes don't oversubscribe the CPU.
+EMBEDDING_NUM_THREADS = int(os.getenv("EMBEDDING_NUM_THREADS", "0"))
+# "auto" picks CUDA when available; set "cpu"/"cuda"/"mps" to force a device.
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "auto")
+
+# Concurrent uploads each encode whole documents; running several of those
+# large batches at once oversubscribes the CPU (or GPU memory) without
+# finishing any sooner. Query embeddings are tiny and are not gated.
+EMBEDDING_INGEST_CONCURRENCY = int(os.getenv("EMBEDDING_INGEST_CONCURRENCY", "1"))
+
+_model: SentenceTransformer | None = None
+_model_lock = Lock()
+_ingest_slots = BoundedSemaphore(max(1, EMBEDDING_INGEST_CONCURRENCY))
+
+
+def embedding_device() -> str:
+    if EMBEDDING_DEVICE and EMBEDDING_DEVICE != "auto":
+        return EMBEDDING_DEVICE
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _batch_size() -> int:
+    """
+    GPUs amortize far better with large batches; keep the library default on CPU.
+    """
+    default = "512" if embedding_device().startswith("cuda") else "32"
+    return int(os.getenv("EMBEDDING_BATCH_SIZE", default))
 
 
-@lru_cache(maxsize=1)
 def _load_model() -> SentenceTransformer:
     # Cache the model across API workers so we don't reload on each request.
-    return SentenceTransformer(EMBEDDING_MODEL)
+    # The lock keeps concurrent first requests from each paying the cold load.
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                if EMBEDDING_NUM_THREADS > 0:
+                    torch.set_num_threads(EMBEDDING_NUM_THREADS)
+                _model = SentenceTransformer(EMBEDDING_MODEL, device=embedding_device())
+    return _model
 
 
-def embed_texts(texts: List[str]) -> List[List[float]]:
+def embed_texts_array(texts: List[str]) -> np.ndarray:
     """
     Embed passages using BGE with the recommended prefix + normalization.
+    Returns a float32 (n, dim) array; vector stores accept it without a list copy.
     """
     if not texts:
-        return []
+        return np.empty((0, EMBEDDING_DIMENSION), dtype=np.float32)
     model = _load_model()
     prefixed = [f"passage: {t}" for t in texts]
-    vectors = model.encode(
-        prefixed,
-        normalize_embeddings=True,
-        convert_to_numpy=True,
-    )
-    return vectors.tolist()
+    with _ingest_slots:
+        return model.encode(
+            prefixed,
+            batch_size=_batch_size(),
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """
+    Embed passages using BGE with the recommended prefix + normalization.
+    """
+    if not texts:
+        return []
+    return embed_texts_array(texts).tolist()
 
 
 def embed_query(query: str) -> List[float]:
@@ -43,6 +92,14 @@ def embed_query(query: str) -> List[float]:
     return vector.tolist()
 
 
+def warm_up() -> None:
+    """
+    Load the model and run one tiny encode so the first real query skips the
+    cold load and first-call kernel setup.
+    """
+    embed_query("warmup")
+
+
 def embedding_model_name() -> str:
     return EMBEDDING_MODEL
 
@@ -1,7 +1,14 @@
 import os
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from threading import Lock
 from typing import Any, Dict
 
-from openai import OpenAI
+import httpx
+from openai import APIConnectionError, APIStatusError, OpenAI
 
 
 def _get_secret(key: str) -> str | None:
@@ -9,26 +16,75 @@ def _get_secret(key: str) -> str | None:
     return env_val
 
 
-class ChatProvider:
-    def chat_complete(
-        self,
-        *,
-        messages,
-        model: str,
-        stream: bool = False,
-        temperature: float | None = None,
-        max_tokens: int | None = None,
-        **kwargs: Any,
-    ):
-        raise NotImplementedError
+@dataclass(frozen=True)
+class Timeouts:
+    """
+    Per-request limits (seconds) applied to every LLM HTTP call. read bounds the
+    wait between streamed chunks; a non-streaming completion sends nothing until
+    the whole answer is generated, so it waits up to complete_read instead.
+    """
 
+    connect: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    read: float = float(os.getenv("LLM_READ_TIMEOUT", "45"))
+    complete_read: float = float(os.getenv("LLM_COMPLETE_READ_TIMEOUT", "120"))
+    write: float = float(os.getenv("LLM_WRITE_TIMEOUT", "10"))
+    pool: float = float(os.getenv("LLM_POOL_TIMEOUT", "5"))
+    max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
 
-class OpenAIProvider(ChatProvider):
-    def __init__(self, api_key: str | None = None):
-        key = api_key or _get_secret("OPENAI_API_KEY")
-        if not key:
-            raise ValueError("Missing OPENAI_API_KEY for OpenAI provider.")
-        self.client = OpenAI(api_key=key)
+    def httpx_timeout(self, read: float | None = None) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.connect,
+            read=self.read if read is None else read,
+            write=self.write,
+            pool=self.pool,
+        )
+
+
+TIMEOUTS = Timeouts()
+
+# Seconds an idle pooled connection stays open.
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+
+
+def _http_client() -> httpx.Client:
+    """
+    Pooled transport for one provider. Idle connections are kept open between
+    turns so the draft, verifier, and later requests skip TCP/TLS setup.
+    """
+    return httpx.Client(
+        timeout=TIMEOUTS.httpx_timeout(),
+        limits=httpx.Limits(
+            max_keepalive_connections=int(os.getenv("LLM_KEEPALIVE_CONNECTIONS", "20")),
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "50")),
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+# Reasoning models (gpt-5 and o-series) count hidden reasoning tokens against
+# max_completion_tokens; this headroom keeps a visible-answer cap from
+# starving them into empty replies. Other models get the cap as stated.
+OPENAI_REASONING_TOKEN_HEADROOM = int(os.getenv("OPENAI_REASONING_TOKEN_HEADROOM", "2048"))
+_REASONING_MODEL_RE = re.compile(r"^(gpt-5|o\d)", re.IGNORECASE)
+
+
+# Fire-and-forget connection warmups (see ChatProvider.prewarm).
+LLM_PREWARM = os.getenv("LLM_PREWARM", "1") not in ("0", "false", "False")
+_WARMUP_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="llm-warmup")
+
+
+# Status codes worth retrying: timeouts, lock/conflict responses, rate limits,
+# and transient upstream errors.
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 425, 429, 500, 502, 503, 504})
+
+
+def _backoff_seconds(attempt: int) -> float:
+    return min(30.0, 0.5 * 2**attempt) + random.random() * 0.25
+
+
+class ChatProvider:
+    client: OpenAI
+    # time.monotonic() of the last request sent on this client; 0 = never.
+    _last_used: float = 0.0
 
     def chat_complete(
         self,
@@ -38,8 +94,13 @@ class OpenAIProvider(ChatProvider):
         stream: bool = False,
         temperature: float | None = None,
         max_tokens: int | None = None,
+        max_output_tokens: int | None = None,
         **kwargs: Any,
     ):
+        """
+        max_output_tokens caps the generated answer and is mapped to each
+        provider's own parameter; max_tokens is passed through unchanged.
+        """
         payload = {
             "model": model,
             "messages": messages,
@@ -49,8 +110,75 @@ class OpenAIProvider(ChatProvider):
             payload["temperature"] = temperature
         if max_tokens is not None:
             payload["max_tokens"] = max_tokens
+        if max_output_tokens is not None:
+            payload.update(self._output_token_limit(max_output_tokens, model))
+        if not stream:
+            payload["timeout"] = TIMEOUTS.httpx_timeout(read=TIMEOUTS.complete_read)
         payload.update(kwargs)
-        return self.client.chat.completions.create(**payload)
+        return self._create_with_retry(payload)
+
+    def _output_token_limit(self, limit: int, model: str) -> Dict[str, int]:
+        return {"max_tokens": limit}
+
+    def prewarm(self) -> None:
+        """
+        Open the provider connection in the background (DNS, TCP, TLS) so the
+        next completion on this client skips the handshake. Only fires when
+        the pool has likely gone cold, i.e. nothing was sent on this client
+        within the keep-alive window. Never raises.
+        """
+        if not LLM_PREWARM:
+            return
+        now = time.monotonic()
+        if self._last_used and now - self._last_used < LLM_KEEPALIVE_EXPIRY:
+            return
+        self._last_used = now
+        _WARMUP_EXECUTOR.submit(self._warm_connection)
+
+    def _warm_connection(self) -> None:
+        try:
+            self.client.with_options(timeout=TIMEOUTS.connect).models.list()
+        except Exception:
+            pass
+
+    def _create_with_retry(self, payload: Dict[str, Any]):
+        """
+        Call the completions API, retrying connection failures, timeouts, and
+        retryable HTTP statuses with capped exponential backoff and jitter.
+        The client itself never retries.
+        """
+        attempt = 0
+        while True:
+            self._last_used = time.monotonic()
+            try:
+                return self.client.chat.completions.create(**payload)
+            except (APIConnectionError, APIStatusError) as exc:
+                # APITimeoutError subclasses APIConnectionError.
+                if isinstance(exc, APIStatusError) and exc.status_code not in RETRYABLE_STATUS_CODES:
+                    raise
+                if attempt >= TIMEOUTS.max_retries:
+                    raise
+                time.sleep(_backoff_seconds(attempt))
+                attempt += 1
+
+
+class OpenAIProvider(ChatProvider):
+    def __init__(self, api_key: str | None = None):
+        key = api_key or _get_secret("OPENAI_API_KEY")
+        if not key:
+            raise ValueError("Missing OPENAI_API_KEY for OpenAI provider.")
+        self.client = OpenAI(
+            api_key=key,
+            timeout=TIMEOUTS.httpx_timeout(),
+            max_retries=0,
+            http_client=_http_client(),
+        )
+
+    def _output_token_limit(self, limit: int, model: str) -> Dict[str, int]:
+        # max_tokens is rejected by newer OpenAI chat models.
+        if _REASONING_MODEL_RE.match(model or ""):
+            limit += OPENAI_REASONING_TOKEN_HEADROOM
+        return {"max_completion_tokens": limit}
 
 
 class VLLMProvider(ChatProvider):
@@ -59,29 +187,17 @@ class VLLMProvider(ChatProvider):
         if not url:
             raise ValueError("Missing VLLM_BASE_URL for vLLM provider.")
         key = api_key or _get_secret("VLLM_API_KEY") or "EMPTY"
-        self.client = OpenAI(api_key=key, base_url=url)
+        self.client = OpenAI(
+            api_key=key,
+            base_url=url,
+            timeout=TIMEOUTS.httpx_timeout(),
+            max_retries=0,
+            http_client=_http_client(),
+        )
 
-    def chat_complete(
-        self,
-        *,
-        messages,
-        model: str,
-        stream: bool = False,
-        temperature: float | None = None,
-        max_tokens: int | None = None,
-        **kwargs: Any,
-    ):
-        payload = {
-            "model": model,
-            "messages": messages,
-            "stream": stream,
-        }
-        if temperature is not None:
-            payload["temperature"] = temperature
-        if max_tokens is not None:
-            payload["max_tokens"] = max_tokens
-        payload.update(kwargs)
-        return self.client.chat.completions.create(**payload)
+
+_providers: Dict[str, ChatProvider] = {}
+_providers_lock = Lock()
 
 
 def get_chat_client(provider: str | None) -> ChatProvider:
@@ -91,15 +207,18 @@ def get_chat_client(provider: str | None) -> ChatProvider:
         - "openai" (default)
         - "qwen-3" -> vLLM endpoint serving Qwen models
         - "vllm" -> generic vLLM OpenAI-compatible endpoint
+    Providers are built once per process and shared, so their connection
+    pools stay warm across requests.
     """
-    if not provider:
-        return OpenAIProvider()
-
-    name = provider.lower()
-    if name == "openai":
-        return OpenAIProvider()
-    if name in ("qwen-3", "vllm"):
-        return VLLMProvider()
+    name = (provider or "openai").lower()
+    # Unknown provider strings fall back to OpenAI.
+    key = "vllm" if name in ("qwen-3", "vllm") else "openai"
 
-    # Default to OpenAI for unknown provider strings.
-    return OpenAIProvider()
+    client = _providers.get(key)
+    if client is None:
+        with _providers_lock:
+            client = _providers.get(key)
+            if client is None:
+                client = VLLMProvider() if key == "vllm" else OpenAIProvider()
+                _providers[key] = client
+    return client
@@ -153,6 +153,16 @@ def _ensure_conversation_index():
         )
 
 
+def _ensure_message_index():
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_messages_conversation_id_id "
+                "ON messages (conversation_id, id)"
+            )
+        )
+
+
 def _copy_documents_to_attachments():
     """
     One-time migration to move legacy document/ chunk tables to the new attachment naming.
@@ -236,6 +246,7 @@ def run_migrations() -> int:
     else:
         _ensure_conversation_columns()
     _ensure_conversation_index()
+    _ensure_message_index()
     _ensure_attachment_metadata_columns()
     _copy_documents_to_attachments()
     _ensure_user_settings(default_user_id)
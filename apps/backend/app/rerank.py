@@ -1,16 +1,48 @@
+import hashlib
+import os
 from typing import List, Dict
 from sentence_transformers import CrossEncoder
 
+from .cache import TTLCache
+
 # Small, fast reranker model
 _model = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
 
+# Cross-encoder scores keyed by (query digest, chunk key). Follow-ups and
+# resends re-rank mostly the same candidates; only unseen pairs hit the model.
+_SCORE_CACHE = TTLCache(
+    max_items=int(os.getenv("RERANK_CACHE_SIZE", "20000")),
+    ttl_sec=float(os.getenv("RERANK_CACHE_TTL", "900")),
+)
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+def warm_up() -> None:
+    _model.predict([("warmup", "warmup")])
+
+
 def rerank(query: str, hits: List[Dict], top_n: int = 8) -> List[Dict]:
-    pairs = [(query, h.get("raw_text", h["text"])) for h in hits]
+    # The model's vocabulary is uncased, so case variants score identically.
+    query_key = _digest(" ".join(query.lower().split()))
+    texts = [h.get("raw_text", h["text"]) for h in hits]
+    keys = [
+        (query_key, h.get("chunk_id") or _digest(text))
+        for h, text in zip(hits, texts)
+    ]
 
-    scores = _model.predict(pairs)
+    scores = [_SCORE_CACHE.get(key) for key in keys]
+    missing = [i for i, s in enumerate(scores) if s is None]
+    if missing:
+        predicted = _model.predict([(query, texts[i]) for i in missing])
+        for i, s in zip(missing, predicted):
+            scores[i] = float(s)
+            _SCORE_CACHE.set(keys[i], scores[i])
 
     for h, s in zip(hits, scores):
-        h["rerank_score"] = float(s)
+        h["rerank_score"] = s
 
     hits.sort(key=lambda x: x["rerank_score"], reverse=True)
     return hits[:top_n]
@@ -1,9 +1,15 @@
 import re
+from functools import lru_cache
 from typing import Dict, List, Optional, Sequence
 
 def classify_intent(question: str) -> str:
-    q = (question or "").lower()
+    # Rules only look at lowercased, whitespace-collapsed text; normalize first
+    # so retries and case variants share a cache entry.
+    return _classify_intent(" ".join((question or "").lower().split()))
 
+
+@lru_cache(maxsize=1024)
+def _classify_intent(q: str) -> str:
     # Impact / ethics
     if any(k in q for k in ["ethic", "bias", "harm", "risk", "safety", "societ", "privacy", "security", "responsible"]):
         return "impact"
@@ -138,6 +144,35 @@ _GENERAL_KNOWLEDGE_PATTERNS = [
 ]
 
 
+_TRIVIAL_MESSAGE_RE = re.compile(
+    r"^\s*(hi|hello|hey|thanks|thank you|thx|ok|okay|cool|nice|great|bye|goodbye)"
+    r"(\s+(there|again|so much|a lot))?[\s!.?]*$",
+    re.IGNORECASE,
+)
+
+
+def needs_retrieval(user_query: str) -> bool:
+    """
+    False for greetings/acknowledgements that no document excerpt can help answer.
+    """
+    return not _TRIVIAL_MESSAGE_RE.match(user_query or "")
+
+
+_QUOTED_LITERAL_RE = re.compile(r'^\s*["\u201c]([^"\u201c\u201d]{2,200})["\u201d]\s*$')
+
+
+def quoted_literal(user_query: str) -> Optional[str]:
+    """
+    The phrase inside a prompt that is nothing but one quoted string, else None.
+    Such prompts are exact-text lookups rather than questions.
+    """
+    m = _QUOTED_LITERAL_RE.match(user_query or "")
+    if not m:
+        return None
+    phrase = " ".join(m.group(1).split())
+    return phrase or None
+
+
 def _has_phrase(text: str, phrases: Sequence[str]) -> Optional[str]:
     for p in phrases:
         if p in text:
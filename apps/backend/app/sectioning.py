@@ -1,9 +1,15 @@
+import hashlib
 import re
-from typing import List, Tuple
+from typing import List, Optional, Pattern, Tuple
+
+from .cache import TTLCache
+
+_WS_RE = re.compile(r"\s+")
+
 
 def _norm(line: str) -> str:
     line = (line or "").strip()
-    line = re.sub(r"\s+", " ", line)
+    line = _WS_RE.sub(" ", line)
     return line
 
 # Universal heading patterns (doc-agnostic)
@@ -25,6 +31,44 @@ PAPER_EXTRA_PATTERNS: List[Tuple[str, str]] = [
     ("overview", r"^(discussion|conclusion|conclusions)\b.*$"),  # often summary-ish
 ]
 
+def _compile_patterns(patterns: List[Tuple[str, str]]) -> Tuple[Pattern, List[str]]:
+    """
+    Fold the ordered pattern list into one alternation so each line is scanned once.
+    Alternatives are tried left to right, so the first listed pattern still wins.
+    """
+    alternation = "|".join(f"(?P<p{i}>{pat})" for i, (_, pat) in enumerate(patterns))
+    return re.compile(alternation, flags=re.IGNORECASE), [section for section, _ in patterns]
+
+
+_UNIVERSAL_RE, _UNIVERSAL_SECTIONS = _compile_patterns(UNIVERSAL_PATTERNS)
+_PAPER_RE, _PAPER_SECTIONS = _compile_patterns(UNIVERSAL_PATTERNS + PAPER_EXTRA_PATTERNS)
+
+# Header match per page-text digest; re-uploads and repeated pages skip the scan.
+_HEADER_CACHE = TTLCache(max_items=8192)
+_NOT_CACHED = object()
+
+
+def _header_section(page_text: str, enable_paper_patterns: bool) -> Optional[str]:
+    """
+    Return the section of the first header-like line on the page, or None.
+    """
+    if enable_paper_patterns:
+        header_re, sections = _PAPER_RE, _PAPER_SECTIONS
+    else:
+        header_re, sections = _UNIVERSAL_RE, _UNIVERSAL_SECTIONS
+
+    # Candidate header lines: short-ish lines
+    lines = [_norm(l) for l in page_text.split("\n")]
+    candidates = [l for l in lines if 0 < len(l) <= 80]
+
+    for line in candidates:
+        m = header_re.match(line)
+        if m:
+            matched = next(name for name, val in m.groupdict().items() if val is not None)
+            return sections[int(matched[1:])]
+    return None
+
+
 def detect_section_from_page_text(
     page_text: str,
     current_section: str = "other",
@@ -37,15 +81,14 @@ def detect_section_from_page_text(
     if not page_text:
         return current_section
 
-    patterns = UNIVERSAL_PATTERNS + (PAPER_EXTRA_PATTERNS if enable_paper_patterns else [])
-
-    # Candidate header lines: short-ish lines
-    lines = [_norm(l) for l in page_text.split("\n")]
-    candidates = [l for l in lines if 0 < len(l) <= 80]
-
-    for line in candidates:
-        for section, pat in patterns:
-            if re.match(pat, line, flags=re.IGNORECASE):
-                return section
+    # The match only depends on the page text, so cache it without current_section.
+    key = (
+        hashlib.blake2b(page_text.encode("utf-8", "surrogatepass"), digest_size=16).digest(),
+        enable_paper_patterns,
+    )
+    section = _HEADER_CACHE.get(key, _NOT_CACHED)
+    if section is _NOT_CACHED:
+        section = _header_section(page_text, enable_paper_patterns)
+        _HEADER_CACHE.set(key, section)
 
-    return current_section
+    return section or current_section
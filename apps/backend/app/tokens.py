@@ -0,0 +1,38 @@
+from functools import lru_cache
+from typing import Dict, List
+
+import tiktoken
+
+# Chat formats add a few tokens of framing per message.
+_PER_MESSAGE_OVERHEAD = 4
+_FALLBACK_ENCODING = "o200k_base"
+
+
+@lru_cache(maxsize=16)
+def _encoding_for(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Non-OpenAI models (e.g. Qwen on vLLM) still get a close estimate.
+        return tiktoken.get_encoding(_FALLBACK_ENCODING)
+
+
+def count_tokens(text: str, model: str) -> int:
+    return len(_encoding_for(model).encode(text or "", disallowed_special=()))
+
+
+def pack_history(messages: List[Dict], model: str, budget: int) -> List[Dict]:
+    """
+    Keep the most recent messages whose combined token count fits the budget.
+    Returns them in their original order.
+    """
+    packed: List[Dict] = []
+    total = 0
+    for msg in reversed(messages):
+        cost = count_tokens(msg["content"], model) + _PER_MESSAGE_OVERHEAD
+        if total + cost > budget:
+            break
+        packed.append(msg)
+        total += cost
+    packed.reverse()
+    return packed
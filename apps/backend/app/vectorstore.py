@@ -2,22 +2,30 @@ import os
 import uuid
 import re
 import hashlib
+import heapq
+from bisect import bisect_right
 from collections import defaultdict
+from functools import lru_cache
+from itertools import accumulate
 from typing import Tuple, List, Dict
 
 import chromadb
 from openai import OpenAI
+from sqlalchemy import exists, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from pypdf import PdfReader
 from docx import Document as DocxDocument
 
 from .embeddings import (
-    embed_texts,
+    embed_texts_array,
     embed_query,
+    warm_up as warm_up_embeddings,
     embedding_model_name,
     embedding_dimension,
 )
+from .cache import TTLCache
 from .sectioning import detect_section_from_page_text
-from .db import SessionLocal
+from .db import session_scope
 from .models import Attachment as AttachmentModel, AttachmentChunk
 
 
@@ -40,6 +48,14 @@ ACTIVE_COLLECTION_NAME = "chroma_bge_large_en_v1_5"
 LEGACY_EMBEDDING_MODEL = "text-embedding-3-small"
 LEGACY_EMBEDDING_DIM = 1536
 
+# Retrieval results per (scope, normalized query, routing, attachment set).
+# The attachment fingerprint changes on every upload/delete, so stale entries
+# are never served; the TTL only bounds memory for idle conversations.
+_HITS_CACHE = TTLCache(
+    max_items=int(os.getenv("RETRIEVAL_CACHE_SIZE", "500")),
+    ttl_sec=float(os.getenv("RETRIEVAL_CACHE_TTL", "300")),
+)
+
 
 def _get_collection(name: str):
     if name not in _collections:
@@ -47,8 +63,13 @@ def _get_collection(name: str):
     return _collections[name]
 
 
-def _db_session():
-    return SessionLocal()
+def warm_up() -> None:
+    """
+    Open the active collection and load the query embedding model ahead of
+    the first retrieval.
+    """
+    _get_collection(ACTIVE_COLLECTION_NAME)
+    warm_up_embeddings()
 
 
 def _get_secret(key: str):
@@ -77,7 +98,7 @@ def _conversation_embedding_config(conversation_id: int) -> Dict:
     Determine which collection/embedding settings to use for a conversation.
     Falls back to legacy if documents exist without metadata.
     """
-    with _db_session() as db:
+    with session_scope() as db:
         doc = (
             db.query(AttachmentModel)
             .filter(AttachmentModel.conversation_id == conversation_id)
@@ -170,11 +191,95 @@ def _delete_existing_doc(
         pass
 
 
+def _already_ingested(db, attachment: AttachmentModel, embedding_cfg: Dict) -> bool:
+    """
+    True when this attachment already has chunks embedded with the given config.
+    Chunk rows are written after the Chroma add, so their presence implies vectors exist.
+    """
+    if attachment.vectorstore_collection != embedding_cfg["vectorstore_collection"]:
+        return False
+    if attachment.embedding_model != embedding_cfg["embedding_model"]:
+        return False
+    return (
+        db.query(AttachmentChunk.id)
+        .filter(AttachmentChunk.attachment_id == attachment.id)
+        .first()
+        is not None
+    )
+
+
+def ingested_file_hashes(db, conversation_id: int, file_hashes: List[str]) -> set[str]:
+    """
+    Subset of file_hashes already attached to the conversation and embedded with
+    the active model, i.e. uploads that can skip the disk write and ingest.
+    """
+    if not file_hashes:
+        return set()
+    cfg = _active_embedding_config()
+    has_chunks = exists().where(AttachmentChunk.attachment_id == AttachmentModel.id)
+    rows = db.query(AttachmentModel.file_hash).filter(
+        AttachmentModel.conversation_id == conversation_id,
+        AttachmentModel.file_hash.in_(file_hashes),
+        AttachmentModel.vectorstore_collection == cfg["vectorstore_collection"],
+        AttachmentModel.embedding_model == cfg["embedding_model"],
+        has_chunks,
+    )
+    return {h for (h,) in rows}
+
+
+def _register_attachment(db, values: Dict) -> int:
+    """
+    Insert the attachment row unless (conversation_id, file_hash) already exists,
+    and return the row id either way. Concurrent uploads of the same file race on
+    the unique constraint instead of raising IntegrityError.
+    """
+    stmt = (
+        sqlite_insert(AttachmentModel)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=["conversation_id", "file_hash"])
+        .returning(AttachmentModel.id)
+    )
+    attachment_id = db.execute(stmt).scalar()
+    if attachment_id is None:
+        attachment_id = (
+            db.query(AttachmentModel.id)
+            .filter(
+                AttachmentModel.conversation_id == values["conversation_id"],
+                AttachmentModel.file_hash == values["file_hash"],
+            )
+            .scalar()
+        )
+    db.commit()
+    return attachment_id
+
+
+def _add_in_batches(collection, ids: List[str], docs: List[str], vectors, metas: List[Dict]) -> None:
+    """
+    Insert into Chroma in batches no larger than the client's max batch size.
+    Vectors stay a float32 ndarray so Chroma doesn't have to re-convert Python lists.
+    """
+    batch_size = _client.get_max_batch_size()
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        collection.add(
+            ids=ids[start:end],
+            documents=docs[start:end],
+            embeddings=vectors[start:end],
+            metadatas=metas[start:end],
+        )
+
+
 def _page_key(doc_id: str, filename: str, page: int) -> Tuple[str, str, int]:
     """Consistent page key used for aggregation/deduping."""
     return (doc_id, filename, page)
 
 
+@lru_cache(maxsize=4)
+def _legacy_openai_client(api_key: str) -> OpenAI:
+    # One client (and connection pool) per key for the whole process.
+    return OpenAI(api_key=api_key)
+
+
 def _legacy_embed_query(query: str) -> List[float]:
     """
     Compatibility path for legacy OpenAI embeddings.
@@ -182,7 +287,7 @@ def _legacy_embed_query(query: str) -> List[float]:
     api_key = _get_secret("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY required for legacy embedding lookups.")
-    client = OpenAI(api_key=api_key)
+    client = _legacy_openai_client(api_key)
     resp = client.embeddings.create(
         model=LEGACY_EMBEDDING_MODEL,
         input=[query],
@@ -198,6 +303,12 @@ def _embed_query(query: str, cfg: Dict) -> List[float]:
     return embed_query(query)
 
 
+def _excerpt(raw: str, max_chars: int = 300) -> str:
+    """Short preview for UI (split/join collapses all whitespace in one pass)."""
+    text = " ".join(raw.split())
+    return text[:max_chars] + "..." if len(text) > max_chars else text
+
+
 def _similarity_from_distance(distance: float) -> float:
     return 1 / (1 + distance)
 
@@ -273,19 +384,17 @@ def _chunk_text(text: str, chunk_size: int = 1200, overlap: int = 0) -> List[str
     if not paragraphs:
         return []
 
+    # Greedy packing via binary search over cumulative lengths. Paragraphs
+    # s..e-1 joined with "\n\n" fit when cum[e] - cum[s] - 2 <= chunk_size.
+    # A paragraph longer than chunk_size still becomes its own chunk.
+    cum = [0, *accumulate(len(p) + 2 for p in paragraphs)]
     chunks = []
-    buf = ""
-
-    for p in paragraphs:
-        if len(buf) + len(p) + 2 <= chunk_size:
-            buf = (buf + "\n\n" + p).strip() if buf else p
-        else:
-            if buf:
-                chunks.append(buf)
-            buf = p
-
-    if buf:
-        chunks.append(buf)
+    start = 0
+    while start < len(paragraphs):
+        end = bisect_right(cum, cum[start] + chunk_size + 2) - 1
+        end = max(end, start + 1)
+        chunks.append("\n\n".join(paragraphs[start:end]))
+        start = end
 
     # Add overlap by prefixing each chunk with tail of previous chunk
     if overlap > 0 and len(chunks) > 1:
@@ -300,80 +409,97 @@ def _chunk_text(text: str, chunk_size: int = 1200, overlap: int = 0) -> List[str
 
 # -------------------- Ingestion --------------------
 
-def ingest_file(
+def _prepare_attachment(
+    db,
+    *,
     path: str,
+    doc_id: str,
     conversation_id: int,
     user_id: int,
-    mime_type: str | None = None,
-    attachment_type: str | None = None,
-) -> str:
+    mime_type: str | None,
+    attachment_type: str | None,
+    embedding_cfg: Dict,
+    collection,
+) -> int | None:
     """
-    Read a file (PDF/TXT/DOCX), chunk it, embed it, and store in Chroma.
-
-    - Uses a stable doc_id based on file content hash to prevent duplicates.
-    - Deletes prior chunks for that doc_id before re-adding (update behavior).
-
-    Returns:
-        doc_id (str): stable id for this document.
+    Create or refresh the attachment row for one file.
+    Returns the attachment id to (re)ingest, or None when the file is already
+    ingested with the active embedding model and can be skipped.
     """
-    doc_id = _stable_doc_id(path)
     filename = os.path.basename(path)
     if not attachment_type:
         ext = os.path.splitext(filename)[1].lower()
         if ext.startswith("."):
             ext = ext[1:]
         attachment_type = ext or mime_type
-    embedding_cfg = _active_embedding_config()
-    collection = _collection_for_config(embedding_cfg)
+
+    attachment = (
+        db.query(AttachmentModel)
+        .filter(
+            AttachmentModel.conversation_id == conversation_id,
+            AttachmentModel.file_hash == doc_id,
+        )
+        .first()
+    )
+
+    if attachment and _already_ingested(db, attachment, embedding_cfg):
+        attachment.name = filename
+        attachment.type = attachment_type or mime_type
+        attachment.path = path
+        db.commit()
+        return None
 
     # Remove previously ingested chunks for this doc (so re-upload updates)
     _delete_existing_doc(doc_id, conversation_id, user_id, collection)
 
-    with _db_session() as db:
-        attachment = (
-            db.query(AttachmentModel)
-            .filter(
-                AttachmentModel.conversation_id == conversation_id,
-                AttachmentModel.file_hash == doc_id,
-            )
-            .first()
+    if not attachment:
+        return _register_attachment(
+            db,
+            {
+                "user_id": user_id,
+                "conversation_id": conversation_id,
+                "name": filename,
+                "type": attachment_type or mime_type,
+                "path": path,
+                "file_hash": doc_id,
+                "embedding_model": embedding_cfg["embedding_model"],
+                "embedding_dim": embedding_cfg["embedding_dim"],
+                "vectorstore_collection": embedding_cfg["vectorstore_collection"],
+            },
         )
+    else:
+        attachment.name = filename
+        attachment.type = attachment_type or mime_type
+        attachment.path = path
+        attachment.embedding_model = embedding_cfg["embedding_model"]
+        attachment.embedding_dim = embedding_cfg["embedding_dim"]
+        attachment.vectorstore_collection = embedding_cfg["vectorstore_collection"]
+        # Keep attachment row, but refresh chunks on re-upload/update.
+        db.query(AttachmentChunk).filter(
+            AttachmentChunk.attachment_id == attachment.id
+        ).delete()
+        db.commit()
 
-        if not attachment:
-            attachment = AttachmentModel(
-                user_id=user_id,
-                conversation_id=conversation_id,
-                name=filename,
-                type=attachment_type or mime_type,
-                path=path,
-                file_hash=doc_id,
-                embedding_model=embedding_cfg["embedding_model"],
-                embedding_dim=embedding_cfg["embedding_dim"],
-                vectorstore_collection=embedding_cfg["vectorstore_collection"],
-            )
-            db.add(attachment)
-            db.commit()
-            db.refresh(attachment)
-        else:
-            attachment.name = filename
-            attachment.type = attachment_type or mime_type
-            attachment.path = path
-            attachment.embedding_model = embedding_cfg["embedding_model"]
-            attachment.embedding_dim = embedding_cfg["embedding_dim"]
-            attachment.vectorstore_collection = embedding_cfg["vectorstore_collection"]
-            # Keep attachment row, but refresh chunks on re-upload/update.
-            db.query(AttachmentChunk).filter(
-                AttachmentChunk.attachment_id == attachment.id
-            ).delete()
-            db.commit()
-
-        attachment_db_id = attachment.id
+    return attachment.id
 
-    ids: List[str] = []
-    docs: List[str] = []
-    metas: List[Dict] = []
-    chunk_rows: List[AttachmentChunk] = []
 
+def _collect_chunks(
+    path: str,
+    *,
+    doc_id: str,
+    attachment_db_id: int,
+    conversation_id: int,
+    user_id: int,
+    embedding_cfg: Dict,
+    ids: List[str],
+    docs: List[str],
+    metas: List[Dict],
+    chunk_rows: List[Dict],
+) -> None:
+    """
+    Read + chunk one file, appending Chroma ids/docs/metas and chunk table rows.
+    """
+    filename = os.path.basename(path)
     current_section = "other"
 
     # Read as list of (page_number, text)
@@ -421,97 +547,146 @@ def ingest_file(
             metas.append(chunk_meta)
 
             chunk_rows.append(
-                AttachmentChunk(
-                    user_id=user_id,
-                    conversation_id=conversation_id,
-                    attachment_id=attachment_db_id,
-                    chunk_id=chunk_id,
-                    chunk_text=chunk,
-                    page=page_idx,
-                    chunk_index=i,
-                    section=current_section,
-                    preview=preview,
-                    char_len=len(chunk),
-                    embedding_model=embedding_cfg["embedding_model"],
-                    embedding_dim=embedding_cfg["embedding_dim"],
-                    vectorstore_collection=embedding_cfg["vectorstore_collection"],
-                )
+                {
+                    "user_id": user_id,
+                    "conversation_id": conversation_id,
+                    "attachment_id": attachment_db_id,
+                    "chunk_id": chunk_id,
+                    "chunk_text": chunk,
+                    "page": page_idx,
+                    "chunk_index": i,
+                    "section": current_section,
+                    "preview": preview,
+                    "char_len": len(chunk),
+                    "embedding_model": embedding_cfg["embedding_model"],
+                    "embedding_dim": embedding_cfg["embedding_dim"],
+                    "vectorstore_collection": embedding_cfg["vectorstore_collection"],
+                }
             )
 
-    # No text? Still return doc_id so caller knows we handled it.
-    if not docs:
-        return doc_id
-
-    vectors = embed_texts(docs)
-
-    collection.add(
-        ids=ids,
-        documents=docs,
-        embeddings=vectors,
-        metadatas=metas,
-    )
 
-    with _db_session() as db:
-        # Fast insert of chunk metadata so UI/debug tooling can use it later.
-        db.add_all(chunk_rows)
-        db.commit()
+def ingest_files(
+    paths: List[str],
+    conversation_id: int,
+    user_id: int,
+    mime_types: List[str | None] | None = None,
+    attachment_types: List[str | None] | None = None,
+    file_hashes: List[str | None] | None = None,
+) -> List[str]:
+    """
+    Ingest several files (PDF/TXT/DOCX) for one conversation in a single pass.
 
-    return doc_id
+    - Uses a stable doc_id per file based on its content hash to prevent duplicates.
+    - Skips parsing/embedding for files already ingested with the active
+      embedding model; only their attachment rows are updated.
+    - Chunks from all remaining files are embedded in one model call, added to
+      Chroma together, and written to the chunk table with one executemany.
 
-# -------------------- Retrieval (RAG) --------------------
+    The optional per-file lists are aligned with paths. Pass file_hashes when the
+    caller already hashed the files to avoid re-reading them.
 
-def retrieve_context_and_sources(
-    query: str,
-    user_id: int,
-    conversation_id: int,
-    k: int = 8,
-    top_pages: int = 2,
-) -> Tuple[str, List[Dict]]:
+    Returns:
+        doc_ids (List[str]): stable ids, in the same order as paths.
     """
-    Given a query string, return:
+    n = len(paths)
+    mime_types = mime_types or [None] * n
+    attachment_types = attachment_types or [None] * n
+    file_hashes = file_hashes or [None] * n
 
-    - context: concatenated top-k chunk texts
-    - sources: list of top 'page' hits with filename + page number
-    """
-    embedding_cfg = _conversation_embedding_config(conversation_id)
+    doc_ids = [file_hashes[i] or _stable_doc_id(paths[i]) for i in range(n)]
+    embedding_cfg = _active_embedding_config()
     collection = _collection_for_config(embedding_cfg)
-    q_vec = _embed_query(query, embedding_cfg)
 
-    # ---- Retrieval scoping ----
-    res = collection.query(
-        query_embeddings=[q_vec],
-        n_results=k,
-        include=["documents", "metadatas", "distances"],
-        where=_scoped_where(conversation_id, user_id),
-    )
+    to_ingest: List[Tuple[str, str, int]] = []
+    with session_scope() as db:
+        for path, doc_id, mime_type, attachment_type in zip(
+            paths, doc_ids, mime_types, attachment_types
+        ):
+            attachment_db_id = _prepare_attachment(
+                db,
+                path=path,
+                doc_id=doc_id,
+                conversation_id=conversation_id,
+                user_id=user_id,
+                mime_type=mime_type,
+                attachment_type=attachment_type,
+                embedding_cfg=embedding_cfg,
+                collection=collection,
+            )
+            if attachment_db_id is not None:
+                to_ingest.append((path, doc_id, attachment_db_id))
 
-    rows = _extract_query_rows(res)
-    if not rows:
-        return "", []
+    ids: List[str] = []
+    docs: List[str] = []
+    metas: List[Dict] = []
+    chunk_rows: List[Dict] = []
+
+    for path, doc_id, attachment_db_id in to_ingest:
+        _collect_chunks(
+            path,
+            doc_id=doc_id,
+            attachment_db_id=attachment_db_id,
+            conversation_id=conversation_id,
+            user_id=user_id,
+            embedding_cfg=embedding_cfg,
+            ids=ids,
+            docs=docs,
+            metas=metas,
+            chunk_rows=chunk_rows,
+        )
 
-    scores = [_similarity_from_distance(dist) for _, _, dist in rows]
+    # No text? Still return doc_ids so caller knows we handled them.
+    if not docs:
+        return doc_ids
 
-    # Aggregate scores by (doc_id, filename, page)
-    page_scores = defaultdict(float)
-    for (_, meta, _), score in zip(rows, scores):
-        key = _page_key(meta["doc_id"], meta["filename"], meta["page"])
-        page_scores[key] += score
+    vectors = embed_texts_array(docs)
+    _add_in_batches(collection, ids, docs, vectors, metas)
 
-    best_pages = sorted(
-        page_scores.items(),
-        key=lambda x: x[1],
-        reverse=True,
-    )[:top_pages]
+    with session_scope() as db:
+        # Single executemany of chunk metadata so UI/debug tooling can use it later.
+        db.execute(insert(AttachmentChunk), chunk_rows)
 
-    sources = [
-        {"doc_id": doc_id, "filename": filename, "page": page}
-        for (doc_id, filename, page), _ in best_pages
-    ]
+    return doc_ids
+
+
+def ingest_file(
+    path: str,
+    conversation_id: int,
+    user_id: int,
+    mime_type: str | None = None,
+    attachment_type: str | None = None,
+    file_hash: str | None = None,
+) -> str:
+    """
+    Read a file (PDF/TXT/DOCX), chunk it, embed it, and store in Chroma.
+    Single-file wrapper around ingest_files.
 
-    # Build context as concatenation of retrieved chunks
-    context = "\n\n---\n\n".join(doc for doc, _, _ in rows)
+    Returns:
+        doc_id (str): stable id for this document.
+    """
+    return ingest_files(
+        [path],
+        conversation_id=conversation_id,
+        user_id=user_id,
+        mime_types=[mime_type],
+        attachment_types=[attachment_type],
+        file_hashes=[file_hash],
+    )[0]
 
-    return context, sources
+# -------------------- Retrieval (RAG) --------------------
+
+def _attachment_fingerprint(conversation_id: int, user_id: int) -> str:
+    with session_scope() as db:
+        rows = (
+            db.query(AttachmentModel.id, AttachmentModel.file_hash)
+            .filter(
+                AttachmentModel.conversation_id == conversation_id,
+                AttachmentModel.user_id == user_id,
+            )
+            .all()
+        )
+    joined = "|".join(sorted(f"{att_id}:{file_hash}" for att_id, file_hash in rows))
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()
 
 
 def retrieve_hits(
@@ -522,6 +697,37 @@ def retrieve_hits(
     intent: str = "general",
     hard_sections: list[str] | None = None,
     preferred: list[str] | None = None,
+) -> List[Dict]:
+    cache_key = (
+        user_id,
+        conversation_id,
+        # BGE (and the reranker) use uncased vocabularies, so case-only
+        # variants of a prompt retrieve the same hits.
+        " ".join(query.lower().split()),
+        k,
+        intent,
+        tuple(hard_sections or ()),
+        tuple(preferred or ()),
+        _attachment_fingerprint(conversation_id, user_id),
+    )
+    cached = _HITS_CACHE.get(cache_key)
+    if cached is None:
+        cached = _retrieve_hits_uncached(
+            query, user_id, conversation_id, k, intent, hard_sections, preferred
+        )
+        _HITS_CACHE.set(cache_key, cached)
+    # Callers (rerank) annotate and reorder hits in place; hand out copies.
+    return [dict(h) for h in cached]
+
+
+def _retrieve_hits_uncached(
+    query: str,
+    user_id: int,
+    conversation_id: int,
+    k: int,
+    intent: str,
+    hard_sections: list[str] | None,
+    preferred: list[str] | None,
 ) -> List[Dict]:
     embedding_cfg = _conversation_embedding_config(conversation_id)
     collection = _collection_for_config(embedding_cfg)
@@ -574,20 +780,17 @@ def retrieve_hits(
             f"{raw}"
         )
 
-        # Short preview for UI
-        excerpt = raw.strip().replace("\n", " ")
-        excerpt = excerpt[:300] + ("..." if len(excerpt) > 300 else "")
-
         hits.append({
             "score": score,
             "raw_text": raw,          # for rerank + verification
             "text": display_text,     # for LLM context
-            "excerpt": excerpt,       # for UI
+            "excerpt": _excerpt(raw),  # for UI
             "filename": meta.get("filename"),
             "page": meta.get("page"),
             "doc_id": meta.get("doc_id"),
             "attachment_id": attachment_id,
             "chunk_index": meta.get("chunk_index"),
+            "chunk_id": meta.get("chunk_id"),
             "section": section,
         })
 
@@ -595,6 +798,52 @@ def retrieve_hits(
     return hits
 
 
+def literal_hits(phrase: str, user_id: int, conversation_id: int, k: int = 30) -> List[Dict]:
+    """
+    Chunks whose text contains phrase (case-insensitive), in document order.
+    Same hit shape as retrieve_hits, without embedding the query.
+    """
+    pattern = "%" + phrase.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    with session_scope() as db:
+        rows = (
+            db.query(AttachmentChunk, AttachmentModel.path, AttachmentModel.name, AttachmentModel.file_hash)
+            .join(AttachmentModel, AttachmentChunk.attachment_id == AttachmentModel.id)
+            .filter(
+                AttachmentChunk.conversation_id == conversation_id,
+                AttachmentChunk.user_id == user_id,
+                AttachmentChunk.chunk_text.ilike(pattern, escape="\\"),
+            )
+            .order_by(AttachmentChunk.attachment_id, AttachmentChunk.page, AttachmentChunk.chunk_index)
+            .limit(k)
+            .all()
+        )
+
+    hits: List[Dict] = []
+    for chunk, path, name, file_hash in rows:
+        filename = os.path.basename(path) if path else name
+        section = chunk.section or "other"
+        raw = chunk.chunk_text
+        hits.append({
+            "score": 1.0,
+            "raw_text": raw,
+            "text": (
+                f"FILE: {filename}\n"
+                f"PAGE: {chunk.page}\n"
+                f"SECTION: {section}\n\n"
+                f"{raw}"
+            ),
+            "excerpt": _excerpt(raw),
+            "filename": filename,
+            "page": chunk.page,
+            "doc_id": file_hash,
+            "attachment_id": chunk.attachment_id,
+            "chunk_index": chunk.chunk_index,
+            "chunk_id": chunk.chunk_id,
+            "section": section,
+        })
+    return hits
+
+
 def build_context_and_sources(
     hits: List[Dict],
     top_pages: int = 2,
@@ -622,27 +871,12 @@ def build_context_and_sources(
         page_scores[key] += score_fn(h)
         page_to_hits[key].append(h)
 
-    # 2) Select top pages
-    best_pages = sorted(
-        page_scores.items(),
-        key=lambda x: x[1],
-        reverse=True
-    )[:top_pages]
+    # 2) Select top pages (dict keys, so already unique)
+    best_pages = heapq.nlargest(top_pages, page_scores.items(), key=lambda x: x[1])
 
     selected_page_keys = [k for (k, _) in best_pages]
 
-    # --- DEDUPE page keys ---
-    seen = set()
-    deduped_page_keys = []
-    for k in selected_page_keys:
-        if k in seen:
-            continue
-        seen.add(k)
-        deduped_page_keys.append(k)
-
-    selected_page_keys = deduped_page_keys
-
-    # 3) Build sources list
+    # 3) Build sources list (one entry per selected page, no dedupe needed)
     sources = [
         {"doc_id": doc_id, "filename": filename, "page": page}
         for (doc_id, filename, page) in selected_page_keys
@@ -651,11 +885,7 @@ def build_context_and_sources(
     # 4) Collect best chunks from selected pages
     selected_hits: List[Dict] = []
     for k in selected_page_keys:
-        page_hits = sorted(
-            page_to_hits[k],
-            key=score_fn,
-            reverse=True
-        )[:chunks_per_page]
+        page_hits = heapq.nlargest(chunks_per_page, page_to_hits[k], key=score_fn)
         selected_hits.extend(page_hits)
 
     # Keep overall order stable
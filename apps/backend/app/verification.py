@@ -2,9 +2,73 @@ import re
 
 DEFAULT_REFUSAL = "I can’t find a supported answer in the provided document excerpts."
 
+# Judge output that leaks verifier vocabulary is discarded in favor of the draft.
+BAD_PREFIXES = (
+    "the draft",
+    "draft is",
+    "the provided material",
+    "the excerpts",
+    "the answer is",
+    "this is supported",
+    "supported by",
+    "unsupported",
+)
+
+
+# Well-formed judge output parses in one scan; the per-field patterns are a
+# fallback for replies that drop or reorder a field.
+_JUDGE_RE = re.compile(
+    r"VERDICT:\s*(SUPPORTED|PARTIAL|UNSUPPORTED).*?"
+    r"CONFIDENCE:\s*([0-1](?:\.\d+)?).*?"
+    r"FINAL:\s*(.*)$",
+    re.S,
+)
+_VERDICT_RE = re.compile(r"VERDICT:\s*(SUPPORTED|PARTIAL|UNSUPPORTED)")
+_CONFIDENCE_RE = re.compile(r"CONFIDENCE:\s*([0-1](?:\.\d+)?)")
+_FINAL_RE = re.compile(r"FINAL:\s*(.*)$", re.S)
+
+
 def _trim(text: str, max_chars: int = 7000) -> str:
     return (text or "")[:max_chars]
 
+
+def _sanitize_final(text: str) -> str:
+    t = (text or "").strip()
+    low = t.lower()
+    # str.startswith accepts a tuple, so all prefixes are checked in one call.
+    if low.startswith(BAD_PREFIXES):
+        return ""
+    if "draft" in low or "excerpts" in low:
+        return ""
+    return t
+
+def _parse_judge_output(text: str, refusal_text: str) -> tuple[str, float, str]:
+    """
+    Extract (verdict, confidence, final) from the judge reply, with safe defaults.
+    """
+    m = _JUDGE_RE.search(text)
+    if m:
+        return m.group(1), float(m.group(2)), m.group(3).strip()
+
+    verdict = "UNSUPPORTED"
+    confidence = 0.0
+    final = refusal_text
+
+    m_v = _VERDICT_RE.search(text)
+    if m_v:
+        verdict = m_v.group(1)
+
+    m_c = _CONFIDENCE_RE.search(text)
+    if m_c:
+        confidence = float(m_c.group(1))
+
+    m_f = _FINAL_RE.search(text)
+    if m_f:
+        final = m_f.group(1).strip()
+
+    return verdict, confidence, final
+
+
 def verify_answer(
     *,
     chat_client,
@@ -14,6 +78,7 @@ def verify_answer(
     context: str,
     evidence_hits,
     refusal_text: str = DEFAULT_REFUSAL,
+    max_output_tokens: int | None = None,
 ):
     """
     Less-strict verifier:
@@ -55,48 +120,12 @@ def verify_answer(
             {"role": "user", "content": judge_user},
         ],
         stream=False,
+        max_output_tokens=max_output_tokens,
     )
 
     text = resp.choices[0].message.content or ""
 
-    verdict = "UNSUPPORTED"
-    confidence = 0.0
-    final = refusal_text
-
-    m_v = re.search(r"VERDICT:\s*(SUPPORTED|PARTIAL|UNSUPPORTED)", text)
-    if m_v:
-        verdict = m_v.group(1)
-
-    m_c = re.search(r"CONFIDENCE:\s*([0-1](?:\.\d+)?)", text)
-    if m_c:
-        try:
-            confidence = float(m_c.group(1))
-        except:
-            confidence = 0.0
-
-    m_f = re.search(r"FINAL:\s*(.*)$", text, flags=re.S)
-    if m_f:
-        final = m_f.group(1).strip()
-
-    BAD_PREFIXES = (
-        "the draft",
-        "draft is",
-        "the provided material",
-        "the excerpts",
-        "the answer is",
-        "this is supported",
-        "supported by",
-        "unsupported",
-    )
-
-    def _sanitize_final(text: str) -> str:
-        t = (text or "").strip()
-        low = t.lower()
-        if any(low.startswith(prefix) for prefix in BAD_PREFIXES):
-            return ""
-        if "draft" in low or "excerpts" in low:
-            return ""
-        return t
+    verdict, confidence, final = _parse_judge_output(text, refusal_text)
 
     sanitized = _sanitize_final(final)
     if not sanitized and verdict != "UNSUPPORTED":
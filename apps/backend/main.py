@@ -1,29 +1,45 @@
+import asyncio
 import hashlib
 import json
 import os
+import tempfile
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from threading import Lock
-from typing import Dict, List, Optional
+from threading import Lock, Thread
+from typing import BinaryIO, Callable, Dict, List, Optional
 
 from fastapi import Body, Depends, FastAPI, File, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, StreamingResponse
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session, selectinload
 
+from backend.app.cache import TTLCache
 from backend.app.db import SessionLocal
 from backend.app.db_init import get_default_user_id, init_db
 from backend.app.llm import get_chat_client
 from backend.app.models import Attachment, Conversation, Message, RoutingDecision, UserSettings
-from backend.app.rerank import rerank
-from backend.app.retrieval_policy import classify_intent, preferred_sections, should_hard_filter
+from backend.app.rerank import rerank, warm_up as warm_up_reranker
+from backend.app.retrieval_policy import (
+    classify_intent,
+    needs_retrieval,
+    preferred_sections,
+    quoted_literal,
+    should_hard_filter,
+)
+from backend.app.tokens import pack_history
 from backend.app.vectorstore import (
     build_context_and_sources,
     delete_conversation_embeddings,
     delete_attachment_embeddings,
-    ingest_file,
+    ingested_file_hashes,
+    ingest_files,
+    literal_hits,
     retrieve_hits,
+    warm_up as warm_up_retrieval,
 )
 from backend.app.verification import verify_answer
 
@@ -46,9 +62,16 @@ DEFAULT_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
 DEFAULT_OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-5-nano")
 DEFAULT_VLLM_MODEL = os.getenv("VLLM_MODEL_NAME", "qwen-3")
 MAX_TURNS = int(os.getenv("MAX_TURNS", "8"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "3000"))
+# Output caps per call type. The verifier rewrites the answer after its
+# VERDICT/CONFIDENCE header, so it needs a draft-sized budget too.
+DIRECT_MAX_OUTPUT_TOKENS = int(os.getenv("DIRECT_MAX_OUTPUT_TOKENS", "512"))
+RAG_MAX_OUTPUT_TOKENS = int(os.getenv("RAG_MAX_OUTPUT_TOKENS", "768"))
+VERIFY_MAX_OUTPUT_TOKENS = int(os.getenv("VERIFY_MAX_OUTPUT_TOKENS", "896"))
 MAX_PINNED = 5
 MAX_ATTACHMENTS = 5
 SUPPORTED_ATTACHMENT_TYPES = {"pdf", "txt", "docx"}
+UPLOAD_CHUNK_SIZE = 1 << 20  # bytes read per chunk when saving uploads
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(BASE_DIR)
@@ -60,6 +83,63 @@ DEFAULT_USER_ID: Optional[int] = None
 CANCELLED_STREAMS: dict[int, bool] = {}
 CANCEL_LOCK = Lock()
 
+DIRECT_SYSTEM_PROMPT = (
+    "You are a helpful assistant. Answer concisely and accurately.\n"
+    "If the question requires document-specific facts, mention that no documents are available."
+)
+RAG_SYSTEM_PROMPT = (
+    "You are a helpful assistant answering questions using the provided document excerpts.\n"
+    "Write a natural, helpful answer grounded in the excerpts.\n"
+    "You may fill small gaps with reasonable assumptions that most readers would make, "
+    "but do NOT invent specific numbers, names, or claims not supported by the excerpts.\n"
+    "If the excerpts don't contain enough to answer, say you can't find a supported answer in the provided documents."
+)
+NO_EXCERPTS_SYSTEM_PROMPT = "You are a helpful assistant. No document excerpts were provided."
+
+# Opt-in: draft the strict "rewrite from excerpts" retry alongside verification
+# so an UNSUPPORTED verdict doesn't add a full serial LLM call. Costs one extra
+# completion on turns that end up SUPPORTED/PARTIAL.
+SPECULATIVE_RETRY_DRAFT = os.getenv("SPECULATIVE_RETRY_DRAFT", "0") in ("1", "true", "True")
+# Separate from ANSWER_EXECUTOR: answer workers block on these futures, so
+# sharing one pool could deadlock when it is saturated.
+SPECULATIVE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SPECULATIVE_WORKERS", "4")),
+    thread_name_prefix="speculative",
+)
+
+# Serialized sidebar listings keyed by (user_id, count, max(updated_at)). Every
+# write to a conversation moves updated_at and deletes move the count, so the
+# key changes whichever worker made the write.
+CONVERSATION_LIST_CACHE = TTLCache(max_items=128, ttl_sec=60)
+
+# Serialized message lists per conversation_cache_key(), stored with the
+# conversation's max(Message.id) when loaded. Messages are only appended while
+# a conversation exists, so a new tip id means a new list, in any worker.
+MESSAGE_LIST_CACHE = TTLCache(max_items=256, ttl_sec=300)
+
+# Last MAX_TURNS {"role", "content"} dicts per conversation_cache_key(), stored
+# with the id of the newest message they include. Readers compare that against
+# the conversation's current max(Message.id), so writes from other worker
+# processes are noticed too.
+HISTORY_CACHE = TTLCache(max_items=256, ttl_sec=1800)
+HISTORY_CACHE_LOCK = Lock()
+
+# Load the embedding model, open the vector collection, and run the reranker
+# once at startup instead of on the first RAG question.
+WARM_UP_ON_STARTUP = os.getenv("WARM_UP_ON_STARTUP", "1") not in ("0", "false", "False")
+
+# Streamed tokens are batched into one message.delta once this many characters
+# are buffered or the oldest buffered token has waited this long.
+STREAM_DELTA_MIN_CHARS = int(os.getenv("STREAM_DELTA_MIN_CHARS", "50"))
+STREAM_DELTA_MAX_WAIT = float(os.getenv("STREAM_DELTA_MAX_WAIT_MS", "30")) / 1000
+
+# Runs generate_answer for streaming requests so the SSE generator can emit the
+# draft while verification is still in flight.
+ANSWER_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("ANSWER_WORKERS", "8")),
+    thread_name_prefix="answer",
+)
+
 
 # ---- Helpers ----
 def get_db():
@@ -130,6 +210,61 @@ def serialize_conversation(conv: Conversation) -> Dict:
     }
 
 
+def conversation_cache_key(conv: Conversation) -> tuple:
+    """
+    Cache key for per-conversation state. SQLite hands out the ids of deleted
+    rows again, so the id alone can name a new chat; created_at tells them apart.
+    """
+    return (conv.id, conv.created_at)
+
+
+def message_tip_id(db: Session, conversation_id: int) -> Optional[int]:
+    return (
+        db.query(func.max(Message.id))
+        .filter(Message.conversation_id == conversation_id)
+        .scalar()
+    )
+
+
+def record_message(msg: Message, conversation: Conversation) -> None:
+    """
+    Extend the cached history with a committed insert when nothing else was
+    inserted since that entry's tip.
+    """
+    key = conversation_cache_key(conversation)
+    with HISTORY_CACHE_LOCK:
+        entry = HISTORY_CACHE.get(key)
+        if entry is None:
+            return
+        tip_id, recent = entry
+        # Ids are allocated max+1 across all conversations, so within this
+        # conversation (the key pins it by created_at) tip_id + 1 proves no
+        # other message landed in between.
+        if tip_id is not None and msg.id == tip_id + 1:
+            recent.append({"role": msg.role, "content": msg.content})
+            HISTORY_CACHE.set(key, (msg.id, recent))
+        else:
+            HISTORY_CACHE.pop(key)
+
+
+def list_serialized_messages(db: Session, conv: Conversation) -> List[Dict]:
+    key = conversation_cache_key(conv)
+    tip_id = message_tip_id(db, conv.id)
+    entry = MESSAGE_LIST_CACHE.get(key)
+    if entry is not None and entry[0] == tip_id:
+        return entry[1]
+    messages = (
+        db.query(Message)
+        .filter(Message.conversation_id == conv.id)
+        .order_by(Message.id)
+        .all()
+    )
+    result = [serialize_message(m) for m in messages]
+    # Tag with the newest id actually loaded, not the one read above.
+    MESSAGE_LIST_CACHE.set(key, (messages[-1].id if messages else None, result))
+    return result
+
+
 def chunk_text(text: str, size: int = 120) -> List[str]:
     if not text:
         return []
@@ -148,28 +283,23 @@ def truncate_title(text: str, max_len: int = 30) -> str:
 
 
 def maybe_rename_conversation_title(
-    db: Session, conversation: Conversation, content: str
+    conversation: Conversation, content: str, recent: List[Dict]
 ) -> None:
+    """
+    Title a default-named conversation after its first user message.
+    recent is the unpacked recent_history() snapshot taken before that message
+    was saved: packing can drop earlier turns, but this window is empty only
+    when the conversation has no messages yet. The change is committed
+    together with the message by add_message.
+    """
     if not conversation.title or not conversation.title.startswith("New chat "):
         return
-    user_count = (
-        db.query(func.count(Message.id))
-        .filter(
-            Message.conversation_id == conversation.id,
-            Message.role == "user",
-        )
-        .scalar()
-        or 0
-    )
-    if user_count != 1:
+    if recent:
         return
     new_title = truncate_title(content, 30)
     if not new_title:
         return
     conversation.title = new_title
-    conversation.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(conversation)
 
 
 def mark_cancelled(conversation_id: int):
@@ -187,9 +317,10 @@ def is_cancelled(conversation_id: int) -> bool:
         return CANCELLED_STREAMS.get(conversation_id, False)
 
 
-def ensure_conversation(db: Session, conversation_id: int, user_id: int) -> Conversation:
+def ensure_conversation(db: Session, conversation_id: int, user_id: int, *options) -> Conversation:
     conv = (
         db.query(Conversation)
+        .options(*options)
         .filter(
             Conversation.id == conversation_id,
             Conversation.user_id == user_id,
@@ -212,15 +343,34 @@ def count_attachments(db: Session, conversation_id: int, user_id: int) -> int:
     )
 
 
-def build_chat_history(db: Session, conversation_id: int) -> List[Dict]:
-    history = (
-        db.query(Message)
-        .filter(Message.conversation_id == conversation_id)
-        .order_by(Message.created_at)
-        .all()
-    )
-    trimmed = history[-MAX_TURNS:]
-    return [{"role": m.role, "content": m.content} for m in trimmed]
+def recent_history(db: Session, conv: Conversation) -> List[Dict]:
+    """
+    Return up to MAX_TURNS recent messages as {"role", "content"} dicts, before
+    any token-budget packing.
+    """
+    key = conversation_cache_key(conv)
+    tip_id = message_tip_id(db, conv.id)
+    with HISTORY_CACHE_LOCK:
+        entry = HISTORY_CACHE.get(key)
+        history = list(entry[1]) if entry is not None and entry[0] == tip_id else None
+
+    if history is None:
+        rows = (
+            db.query(Message.id, Message.role, Message.content)
+            .filter(Message.conversation_id == conv.id)
+            .order_by(Message.id.desc())
+            .limit(MAX_TURNS)
+            .all()
+        )
+        recent = deque(
+            ({"role": role, "content": content} for _, role, content in reversed(rows)),
+            maxlen=MAX_TURNS,
+        )
+        # Tag with the newest id actually loaded so the entry always describes
+        # exactly its own contents.
+        HISTORY_CACHE.set(key, (rows[0][0] if rows else None, recent))
+        history = list(recent)
+    return history
 
 
 def enforce_use_docs(
@@ -257,9 +407,12 @@ def build_evidence(evidence_hits: List[Dict], verdict: Optional[str]) -> List[Di
         att_id = h.get("attachment_id")
         if not att_id:
             continue
+        # The excerpt stays inline so the message keeps its evidence after the
+        # attachment's chunks are deleted or re-ingested.
         evidence.append(
             {
                 "attachmentId": att_id,
+                "chunkId": h.get("chunk_id"),
                 "page": h.get("page"),
                 "excerpt": h.get("excerpt"),
                 "filename": h.get("filename"),
@@ -269,22 +422,32 @@ def build_evidence(evidence_hits: List[Dict], verdict: Optional[str]) -> List[Di
     return evidence
 
 
-def save_routing_decision(
+def save_assistant_reply(
     db: Session,
-    message_id: int,
-    answer_mode: str,
+    conversation: Conversation,
+    answer: str,
+    meta: Dict,
     reason: str,
-    confidence: float,
-):
-    decision = RoutingDecision(
-        message_id=message_id,
-        answer_mode=answer_mode,
+) -> Message:
+    """
+    Persist the assistant message and its routing decision in one commit.
+    """
+    conversation.updated_at = datetime.utcnow()
+    msg = Message(
+        conversation_id=conversation.id,
+        role="assistant",
+        content=answer,
+        meta=meta,
+    )
+    msg.routing_decision = RoutingDecision(
+        answer_mode=meta.get("answer_mode", "direct"),
         reason=reason,
-        confidence=confidence,
+        confidence=meta.get("confidence") or 1.0,
     )
-    db.add(decision)
+    db.add(msg)
     db.commit()
-    db.refresh(decision)
+    record_message(msg, conversation)
+    return msg
 
 
 def add_message(
@@ -303,45 +466,82 @@ def add_message(
     )
     db.add(msg)
     db.commit()
-    db.refresh(conversation)
-    db.refresh(msg)
+    record_message(msg, conversation)
     return msg
 
 
+def complete_text(
+    chat_client,
+    model: str,
+    messages: List[Dict],
+    on_delta: Optional[Callable[[str], None]] = None,
+    max_output_tokens: Optional[int] = None,
+) -> str:
+    """
+    Run a chat completion and return its text, streaming it through on_delta
+    when a callback is given.
+    """
+    if on_delta is None:
+        resp = chat_client.chat_complete(
+            model=model,
+            messages=messages,
+            stream=False,
+            max_output_tokens=max_output_tokens,
+        )
+        return resp.choices[0].message.content or ""
+    parts: List[str] = []
+    stream = chat_client.chat_complete(
+        model=model,
+        messages=messages,
+        stream=True,
+        max_output_tokens=max_output_tokens,
+    )
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            on_delta(delta)
+    return "".join(parts)
+
+
 def generate_answer(
     *,
     db: Session,
     conversation: Conversation,
     user_message: str,
     use_docs_requested: bool,
+    chat_history: List[Dict],
+    on_delta: Optional[Callable[[str], None]] = None,
 ) -> tuple[str, Dict, str]:
     """
     Generate an assistant response and return (final_text, meta, routing_reason).
+    chat_history holds the turns before user_message.
+    on_delta, if given, receives the direct answer or the unverified RAG draft
+    token by token as the model produces it; the db session is not used once
+    generation starts.
     """
     user_id = conversation.user_id
     use_docs, warning = enforce_use_docs(db, conversation.id, user_id, use_docs_requested)
+    skip_reason = None
+    if use_docs and not needs_retrieval(user_message):
+        use_docs = False
+        skip_reason = "Trivial message; retrieval skipped."
 
     provider = DEFAULT_PROVIDER
     model = model_for_provider(provider)
     chat_client = get_chat_client(provider)
-    chat_history = build_chat_history(db, conversation.id)
 
     if not use_docs:
-        system_prompt = (
-            "You are a helpful assistant. Answer concisely and accurately.\n"
-            "If the question requires document-specific facts, mention that no documents are available."
-        )
         messages = [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": DIRECT_SYSTEM_PROMPT},
             *chat_history,
             {"role": "user", "content": user_message},
         ]
-        resp = chat_client.chat_complete(
-            model=model,
-            messages=messages,
-            stream=False,
+        answer = complete_text(
+            chat_client, model, messages, on_delta, DIRECT_MAX_OUTPUT_TOKENS
         )
-        answer = resp.choices[0].message.content or ""
         meta = {
             "use_docs": False,
             "citations": [],
@@ -351,51 +551,79 @@ def generate_answer(
             "confidence": None,
             "warning": warning,
         }
-        routing_reason = warning or "Answered without document retrieval."
+        routing_reason = warning or skip_reason or "Answered without document retrieval."
         return answer, meta, routing_reason
 
     # ---- RAG path ----
+    # Retrieval and rerank take a while; if the LLM connection has gone idle,
+    # use that time to reopen it.
+    chat_client.prewarm()
     intent = classify_intent(user_message)
     preferred = preferred_sections(intent)
     hard_sections = preferred if should_hard_filter(intent) and preferred else None
 
-    hits = retrieve_hits(
-        user_message,
-        user_id=user_id,
-        conversation_id=conversation.id,
-        k=30,
-        intent=intent,
-        hard_sections=hard_sections,
-        preferred=preferred,
-    )
+    # A prompt that is only a quoted phrase is an exact-text lookup; match it
+    # in the stored chunks and skip the query embedding when anything is found.
+    literal = quoted_literal(user_message)
+    hits = literal_hits(literal, user_id, conversation.id, k=30) if literal else []
+    if not hits:
+        hits = retrieve_hits(
+            user_message,
+            user_id=user_id,
+            conversation_id=conversation.id,
+            k=30,
+            intent=intent,
+            hard_sections=hard_sections,
+            preferred=preferred,
+        )
 
     hits = rerank(user_message, hits, top_n=18)
     context, sources, evidence_hits = build_context_and_sources(hits, top_pages=3)
 
-    answer_system = (
-        "You are a helpful assistant answering questions using the provided document excerpts.\n"
-        "Write a natural, helpful answer grounded in the excerpts.\n"
-        "You may fill small gaps with reasonable assumptions that most readers would make, "
-        "but do NOT invent specific numbers, names, or claims not supported by the excerpts.\n"
-        "If the excerpts don't contain enough to answer, say you can't find a supported answer in the provided documents.\n\n"
-        f"DOCUMENT EXCERPTS:\n{context}"
-        if context
-        else "You are a helpful assistant. No document excerpts were provided."
-    )
+    if context:
+        # Static instructions first so providers with prefix caching can reuse them.
+        system_messages = [
+            {"role": "system", "content": RAG_SYSTEM_PROMPT},
+            {"role": "system", "content": f"DOCUMENT EXCERPTS:\n{context}"},
+        ]
+    else:
+        system_messages = [{"role": "system", "content": NO_EXCERPTS_SYSTEM_PROMPT}]
     answer_messages = [
-        {"role": "system", "content": answer_system},
+        *system_messages,
         *chat_history,
         {"role": "user", "content": user_message},
     ]
 
-    resp = chat_client.chat_complete(
-        model=model,
-        messages=answer_messages,
-        stream=False,
+    draft = complete_text(
+        chat_client, model, answer_messages, on_delta, RAG_MAX_OUTPUT_TOKENS
     )
-    draft = resp.choices[0].message.content or ""
 
     refusal = "I can’t find a supported answer in the provided document excerpts."
+    retry_system = (
+        "You are answering using document excerpts.\n"
+        "Rewrite the answer so every key claim is directly supported or clearly deducible from the excerpts.\n"
+        "If not possible, reply exactly with:\n"
+        f"{refusal}\n\n"
+        f"DOCUMENT EXCERPTS:\n{context}"
+    )
+    retry_messages = [
+        {"role": "system", "content": retry_system},
+        {"role": "user", "content": user_message},
+    ]
+    # The strict rewrite does not depend on the verdict, so it can be drafted
+    # while the verifier runs; it is discarded unless the verdict is UNSUPPORTED.
+    speculative_retry = (
+        SPECULATIVE_EXECUTOR.submit(
+            complete_text,
+            chat_client,
+            model,
+            retry_messages,
+            max_output_tokens=RAG_MAX_OUTPUT_TOKENS,
+        )
+        if SPECULATIVE_RETRY_DRAFT
+        else None
+    )
+
     final_answer, vdebug = verify_answer(
         chat_client=chat_client,
         model=model,
@@ -404,28 +632,21 @@ def generate_answer(
         context=context,
         evidence_hits=evidence_hits,
         refusal_text=refusal,
+        max_output_tokens=VERIFY_MAX_OUTPUT_TOKENS,
     )
     verdict = (vdebug or {}).get("verdict", "UNSUPPORTED")
     confidence = float((vdebug or {}).get("confidence", 0.0) or 0.0)
 
+    if verdict != "UNSUPPORTED" and speculative_retry is not None:
+        speculative_retry.cancel()
+
     if verdict == "UNSUPPORTED":
-        retry_system = (
-            "You are answering using document excerpts.\n"
-            "Rewrite the answer so every key claim is directly supported or clearly deducible from the excerpts.\n"
-            "If not possible, reply exactly with:\n"
-            f"{refusal}\n\n"
-            f"DOCUMENT EXCERPTS:\n{context}"
-        )
-        retry_messages = [
-            {"role": "system", "content": retry_system},
-            {"role": "user", "content": user_message},
-        ]
-        retry_resp = chat_client.chat_complete(
-            model=model,
-            messages=retry_messages,
-            stream=False,
-        )
-        retry_draft = retry_resp.choices[0].message.content or ""
+        if speculative_retry is not None:
+            retry_draft = speculative_retry.result()
+        else:
+            retry_draft = complete_text(
+                chat_client, model, retry_messages, max_output_tokens=RAG_MAX_OUTPUT_TOKENS
+            )
 
         final_answer, vdebug = verify_answer(
             chat_client=chat_client,
@@ -435,6 +656,7 @@ def generate_answer(
             context=context,
             evidence_hits=evidence_hits,
             refusal_text=refusal,
+            max_output_tokens=VERIFY_MAX_OUTPUT_TOKENS,
         )
         verdict = (vdebug or {}).get("verdict", "UNSUPPORTED")
         confidence = float((vdebug or {}).get("confidence", 0.0) or 0.0)
@@ -486,17 +708,191 @@ def assign_pinned_order(db: Session, user_id: int) -> int:
     return (current_max or 0) + 1
 
 
+def spool_upload(stream: BinaryIO, directory: str) -> tuple[str, str]:
+    """
+    Copy an upload stream to a temp file in directory in 1 MiB chunks,
+    hashing as it goes. Returns (temp_path, sha256_hex).
+    """
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest()
+
+
+def store_attachments(
+    db: Session,
+    conv: Conversation,
+    user_id: int,
+    uploads: List[tuple[str, Optional[str], BinaryIO]],
+) -> tuple[List[Attachment], List[Dict]]:
+    """
+    Validate, save, and ingest uploaded (filename, content_type, stream) files.
+    Files are validated one by one: unsupported types and files past the
+    attachment limit are reported in the returned errors while the rest are
+    stored. Files with identical content are collapsed; all new files are
+    chunked and embedded together in one ingest_files call.
+    Returns (attachments, errors) with errors as {"filename", "detail"} dicts.
+    """
+    errors: List[Dict] = []
+    accepted: List[tuple[str, Optional[str], str, BinaryIO]] = []
+    for filename, content_type, stream in uploads:
+        safe_name = os.path.basename(filename or "")
+        ext = os.path.splitext(safe_name)[1].lower().lstrip(".")
+        if ext not in SUPPORTED_ATTACHMENT_TYPES:
+            errors.append({"filename": safe_name, "detail": "Unsupported file type."})
+            continue
+        accepted.append((safe_name, content_type, ext, stream))
+
+    conv_dir = os.path.join(RAW_DATA_DIR, str(user_id), str(conv.id))
+    os.makedirs(conv_dir, exist_ok=True)
+
+    # (safe_name, content_type, ext, file_hash, temp_path)
+    prepared: List[tuple[str, Optional[str], str, str, str]] = []
+    try:
+        seen_hashes: set[str] = set()
+        for safe_name, content_type, ext, stream in accepted:
+            tmp_path, file_hash = spool_upload(stream, conv_dir)
+            if file_hash in seen_hashes:
+                os.remove(tmp_path)
+                continue
+            seen_hashes.add(file_hash)
+            prepared.append((safe_name, content_type, ext, file_hash, tmp_path))
+
+        existing = {
+            file_hash: path
+            for file_hash, path in db.query(Attachment.file_hash, Attachment.path).filter(
+                Attachment.conversation_id == conv.id,
+                Attachment.user_id == user_id,
+            )
+        }
+        # Re-uploads don't count against the limit; new files fill the
+        # remaining slots in upload order.
+        slots = MAX_ATTACHMENTS - len(existing)
+        within_limit = []
+        for entry in prepared:
+            if entry[3] in existing:
+                within_limit.append(entry)
+            elif slots > 0:
+                within_limit.append(entry)
+                slots -= 1
+            else:
+                os.remove(entry[4])
+                errors.append(
+                    {
+                        "filename": entry[0],
+                        "detail": f"Maximum of {MAX_ATTACHMENTS} attachments per conversation.",
+                    }
+                )
+        prepared = within_limit
+
+        hashes = [p[3] for p in prepared]
+        # Files already embedded with the active model need neither a disk
+        # write nor another ingest pass; their existing rows are returned.
+        ingested = ingested_file_hashes(db, conv.id, hashes)
+    except BaseException:
+        for p in prepared:
+            if os.path.exists(p[4]):
+                os.remove(p[4])
+        raise
+
+    # Every path already held in this conversation (or claimed earlier in this
+    # batch) is reserved; a file may only be rewritten at its own existing path,
+    # never at another file's.
+    taken_paths = {path for path in existing.values() if path}
+    to_ingest: List[tuple[str, Optional[str], str, str, str]] = []
+    paths: List[str] = []
+    for entry in prepared:
+        safe_name, _, _, file_hash, tmp_path = entry
+        if file_hash in ingested:
+            os.remove(tmp_path)
+            continue
+        path = existing.get(file_hash)
+        if not path:
+            path = os.path.join(conv_dir, safe_name)
+            if path in taken_paths:
+                stem, suffix = os.path.splitext(safe_name)
+                path = os.path.join(conv_dir, f"{stem}-{file_hash[:8]}{suffix}")
+        os.replace(tmp_path, path)
+        taken_paths.add(path)
+        to_ingest.append(entry)
+        paths.append(path)
+
+    if to_ingest:
+        ingest_files(
+            paths,
+            conversation_id=conv.id,
+            user_id=user_id,
+            mime_types=[p[1] for p in to_ingest],
+            attachment_types=[p[2] for p in to_ingest],
+            file_hashes=[p[3] for p in to_ingest],
+        )
+
+    if not hashes:
+        return [], errors
+
+    # Ensure the ORM rows have the latest path + type
+    by_hash = {
+        a.file_hash: a
+        for a in db.query(Attachment).filter(
+            Attachment.conversation_id == conv.id,
+            Attachment.user_id == user_id,
+            Attachment.file_hash.in_(hashes),
+        )
+    }
+    if any(h not in by_hash for h in hashes):
+        raise HTTPException(status_code=500, detail="Failed to persist attachment.")
+
+    for path, (_, _, ext, file_hash, _) in zip(paths, to_ingest):
+        attachment = by_hash[file_hash]
+        attachment.path = path
+        attachment.type = ext
+    conv.updated_at = datetime.utcnow()
+    if not conv.use_docs_default:
+        conv.use_docs_default = True
+    db.commit()
+    return [by_hash[h] for h in hashes], errors
+
+
 # ---- Startup ----
 @app.on_event("startup")
 def on_startup():
     global DEFAULT_USER_ID
     DEFAULT_USER_ID = init_db()
+    if WARM_UP_ON_STARTUP:
+        # Off the event loop so the server accepts requests while models load;
+        # an early query simply waits on the embedding model's load lock.
+        Thread(target=warm_up_models, name="warmup", daemon=True).start()
+
+
+def warm_up_models() -> None:
+    try:
+        warm_up_retrieval()
+        warm_up_reranker()
+    except Exception:
+        # Best effort; the first request loads whatever is still cold.
+        pass
 
 
 # ---- Routes ----
 @app.get("/conversations")
 def list_conversations(db: Session = Depends(get_db)):
     user_id = current_user_id()
+    count, last_updated = (
+        db.query(func.count(Conversation.id), func.max(Conversation.updated_at))
+        .filter(Conversation.user_id == user_id)
+        .one()
+    )
+    key = (user_id, count, last_updated)
+    cached = CONVERSATION_LIST_CACHE.get(key)
+    if cached is not None:
+        return cached
     convs = (
         db.query(Conversation)
         .filter(Conversation.user_id == user_id)
@@ -508,7 +904,9 @@ def list_conversations(db: Session = Depends(get_db)):
         )
         .all()
     )
-    return [serialize_conversation(c) for c in convs]
+    result = [serialize_conversation(c) for c in convs]
+    CONVERSATION_LIST_CACHE.set(key, result)
+    return result
 
 
 @app.post("/conversations")
@@ -524,11 +922,9 @@ def create_conversation(db: Session = Depends(get_db)):
         use_docs_default=use_docs_default,
     )
     db.add(conv)
-    db.commit()
-    db.refresh(conv)
+    db.flush()  # assigns conv.id for the default title
     conv.title = f"New chat {conv.id}"
     db.commit()
-    db.refresh(conv)
     return serialize_conversation(conv)
 
 
@@ -536,12 +932,6 @@ def create_conversation(db: Session = Depends(get_db)):
 def get_conversation(conversation_id: int, db: Session = Depends(get_db)):
     user_id = current_user_id()
     conv = ensure_conversation(db, conversation_id, user_id)
-    messages = (
-        db.query(Message)
-        .filter(Message.conversation_id == conv.id)
-        .order_by(Message.created_at)
-        .all()
-    )
     attachments = (
         db.query(Attachment)
         .filter(
@@ -553,7 +943,7 @@ def get_conversation(conversation_id: int, db: Session = Depends(get_db)):
     )
     return {
         "conversation": serialize_conversation(conv),
-        "messages": [serialize_message(m) for m in messages],
+        "messages": list_serialized_messages(db, conv),
         "attachments": [serialize_attachment(a) for a in attachments],
     }
 
@@ -565,11 +955,24 @@ def update_conversation(
     db: Session = Depends(get_db),
 ):
     user_id = current_user_id()
-    conv = ensure_conversation(db, conversation_id, user_id)
-
     title = payload.get("title")
     is_pinned = payload.get("isPinned")
 
+    if is_pinned is None and title is not None and title.strip():
+        # Plain rename: one UPDATE ... RETURNING instead of SELECT then UPDATE.
+        conv = db.scalars(
+            update(Conversation)
+            .where(Conversation.id == conversation_id, Conversation.user_id == user_id)
+            .values(title=title.strip(), updated_at=datetime.utcnow())
+            .returning(Conversation)
+        ).first()
+        if not conv:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        db.commit()
+        return serialize_conversation(conv)
+
+    conv = ensure_conversation(db, conversation_id, user_id)
+
     if title is not None:
         conv.title = title.strip() or conv.title
         conv.updated_at = datetime.utcnow()
@@ -588,20 +991,30 @@ def update_conversation(
         conv.updated_at = datetime.utcnow()
 
     db.commit()
-    db.refresh(conv)
     return serialize_conversation(conv)
 
 
 @app.delete("/conversations/{conversation_id}")
 def delete_conversation(conversation_id: int, db: Session = Depends(get_db)):
     user_id = current_user_id()
-    conv = ensure_conversation(db, conversation_id, user_id)
+    # The delete cascade walks every message, routing decision, attachment and
+    # chunk; load them up front instead of one lazy SELECT per parent row.
+    conv = ensure_conversation(
+        db,
+        conversation_id,
+        user_id,
+        selectinload(Conversation.messages).selectinload(Message.routing_decision),
+        selectinload(Conversation.attachments).selectinload(Attachment.chunks),
+    )
 
     # Capture attachment paths for cleanup before deleting ORM objects
     attachment_paths = [a.path for a in conv.attachments if a.path]
 
     db.delete(conv)
     db.commit()
+    cache_key = conversation_cache_key(conv)
+    MESSAGE_LIST_CACHE.pop(cache_key)
+    HISTORY_CACHE.pop(cache_key)
 
     delete_conversation_embeddings(conversation_id, user_id)
 
@@ -663,14 +1076,8 @@ def update_pinned_order(payload: Dict = Body(...), db: Session = Depends(get_db)
 @app.get("/conversations/{conversation_id}/messages")
 def list_messages(conversation_id: int, db: Session = Depends(get_db)):
     user_id = current_user_id()
-    ensure_conversation(db, conversation_id, user_id)
-    messages = (
-        db.query(Message)
-        .filter(Message.conversation_id == conversation_id)
-        .order_by(Message.created_at)
-        .all()
-    )
-    return [serialize_message(m) for m in messages]
+    conv = ensure_conversation(db, conversation_id, user_id)
+    return list_serialized_messages(db, conv)
 
 
 @app.post("/conversations/{conversation_id}/messages")
@@ -686,8 +1093,14 @@ def create_message(
     if not content:
         raise HTTPException(status_code=400, detail="Message content is required.")
 
+    # Snapshot prior turns before saving the new one; generate_answer appends
+    # the current prompt itself.
+    recent = recent_history(db, conv)
+    maybe_rename_conversation_title(conv, content, recent)
+    chat_history = pack_history(
+        recent, model_for_provider(DEFAULT_PROVIDER), HISTORY_TOKEN_BUDGET
+    )
     user_msg = add_message(db, conv, "user", content)
-    maybe_rename_conversation_title(db, conv, content)
 
     try:
         start = time.perf_counter()
@@ -696,20 +1109,14 @@ def create_message(
             conversation=conv,
             user_message=content,
             use_docs_requested=use_docs,
+            chat_history=chat_history,
         )
         elapsed = time.perf_counter() - start
         meta["latency_seconds"] = round(elapsed, 3)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    assistant_msg = add_message(db, conv, "assistant", answer, meta=meta)
-    save_routing_decision(
-        db=db,
-        message_id=assistant_msg.id,
-        answer_mode=meta.get("answer_mode", "direct"),
-        reason=reason,
-        confidence=meta.get("confidence") or 1.0,
-    )
+    assistant_msg = save_assistant_reply(db, conv, answer, meta, reason)
 
     warning = meta.get("warning")
     response = {
@@ -741,39 +1148,90 @@ async def stream_message(
     if not content:
         raise HTTPException(status_code=400, detail="Message content is required.")
 
+    # Snapshot prior turns before saving the new one; generate_answer appends
+    # the current prompt itself.
+    recent = recent_history(db, conv)
+    maybe_rename_conversation_title(conv, content, recent)
+    chat_history = pack_history(
+        recent, model_for_provider(DEFAULT_PROVIDER), HISTORY_TOKEN_BUDGET
+    )
     user_msg = add_message(db, conv, "user", content)
-    maybe_rename_conversation_title(db, conv, content)
 
-    def event_builder():
+    async def event_builder():
         try:
             clear_cancelled(conversation_id)
             yield f"event: message.status\ndata: {json.dumps({'status': 'thinking'})}\n\n"
             start = time.perf_counter()
-            answer, meta, reason = generate_answer(
+            # The worker posts model deltas as they arrive, then None when it
+            # finishes. Waiting on an asyncio.Queue keeps the stream from pinning
+            # a threadpool thread for the whole answer.
+            loop = asyncio.get_running_loop()
+            deltas: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+
+            def post(delta: Optional[str]) -> None:
+                loop.call_soon_threadsafe(deltas.put_nowait, delta)
+
+            future = ANSWER_EXECUTOR.submit(
+                generate_answer,
                 db=db,
                 conversation=conv,
                 user_message=content,
                 use_docs_requested=use_docs,
+                chat_history=chat_history,
+                on_delta=post,
             )
+            future.add_done_callback(lambda _: post(None))
+
+            # For RAG answers this is the unverified draft; verification runs
+            # after it and message.final carries the answer that replaces it.
+            # Tokens are merged into ~STREAM_DELTA_MIN_CHARS pieces (or whatever
+            # arrived within STREAM_DELTA_MAX_WAIT) so the client gets one event,
+            # and one re-render, per few tokens without a visible stall.
+            streamed = False
+            pending: List[str] = []
+            pending_len = 0
+            flush_at = 0.0
+            while True:
+                if pending:
+                    try:
+                        delta = await asyncio.wait_for(
+                            deltas.get(), max(0.0, flush_at - loop.time())
+                        )
+                    except asyncio.TimeoutError:
+                        delta = ""  # wait elapsed: flush what is buffered
+                else:
+                    delta = await deltas.get()
+                if delta:
+                    if not pending:
+                        flush_at = loop.time() + STREAM_DELTA_MAX_WAIT
+                    pending.append(delta)
+                    pending_len += len(delta)
+                    if pending_len < STREAM_DELTA_MIN_CHARS and loop.time() < flush_at:
+                        continue
+                if is_cancelled(conversation_id):
+                    yield f"event: message.cancelled\ndata: {json.dumps({'status': 'cancelled'})}\n\n"
+                    return
+                if pending:
+                    streamed = True
+                    yield f"event: message.delta\ndata: {json.dumps({'delta': ''.join(pending)})}\n\n"
+                    pending.clear()
+                    pending_len = 0
+                if delta is None:
+                    break
+
+            answer, meta, reason = await asyncio.wrap_future(future)
             elapsed = time.perf_counter() - start
             meta["latency_seconds"] = round(elapsed, 3)
             if is_cancelled(conversation_id):
                 yield f"event: message.cancelled\ndata: {json.dumps({'status': 'cancelled'})}\n\n"
                 return
 
-            for delta in chunk_text(answer):
-                if is_cancelled(conversation_id):
-                    yield f"event: message.cancelled\ndata: {json.dumps({'status': 'cancelled'})}\n\n"
-                    return
-                yield f"event: message.delta\ndata: {json.dumps({'delta': delta})}\n\n"
+            if not streamed:
+                for delta in chunk_text(answer):
+                    yield f"event: message.delta\ndata: {json.dumps({'delta': delta})}\n\n"
 
-            assistant_msg = add_message(db, conv, "assistant", answer, meta=meta)
-            save_routing_decision(
-                db=db,
-                message_id=assistant_msg.id,
-                answer_mode=meta.get("answer_mode", "direct"),
-                reason=reason,
-                confidence=meta.get("confidence") or 1.0,
+            assistant_msg = await run_in_threadpool(
+                save_assistant_reply, db, conv, answer, meta, reason
             )
 
             final_payload = serialize_message(assistant_msg)
@@ -812,78 +1270,35 @@ def list_attachments(conversation_id: int, db: Session = Depends(get_db)):
 
 
 @app.post("/conversations/{conversation_id}/attachments")
-async def upload_attachment(
+def upload_attachment(
     conversation_id: int,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
 ):
     user_id = current_user_id()
     conv = ensure_conversation(db, conversation_id, user_id)
-
-    existing = count_attachments(db, conversation_id, user_id)
-    data = await file.read()
-    file_hash = hashlib.sha256(data).hexdigest()
-
-    existing_hash = (
-        db.query(Attachment)
-        .filter(
-            Attachment.conversation_id == conversation_id,
-            Attachment.user_id == user_id,
-            Attachment.file_hash == file_hash,
-        )
-        .first()
-    )
-
-    if not existing_hash and existing >= MAX_ATTACHMENTS:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Maximum of {MAX_ATTACHMENTS} attachments per conversation.",
-        )
-
-    ext = os.path.splitext(file.filename)[1].lower().lstrip(".")
-    if ext not in SUPPORTED_ATTACHMENT_TYPES:
-        raise HTTPException(status_code=400, detail="Unsupported file type.")
-
-    conv_dir = os.path.join(RAW_DATA_DIR, str(user_id), str(conversation_id))
-    os.makedirs(conv_dir, exist_ok=True)
-
-    safe_name = os.path.basename(file.filename)
-    path = os.path.join(conv_dir, safe_name)
-    with open(path, "wb") as f:
-        f.write(data)
-
-    ingest_file(
-        path,
-        conversation_id=conversation_id,
-        user_id=user_id,
-        mime_type=file.content_type,
-        attachment_type=ext,
+    attachments, errors = store_attachments(
+        db, conv, user_id, [(file.filename, file.content_type, file.file)]
     )
+    if errors:
+        raise HTTPException(status_code=400, detail=errors[0]["detail"])
+    return serialize_attachment(attachments[0])
 
-    # Ensure the ORM row has the latest path + type
-    attachment = (
-        db.query(Attachment)
-        .filter(
-            Attachment.conversation_id == conversation_id,
-            Attachment.user_id == user_id,
-            Attachment.file_hash == file_hash,
-        )
-        .order_by(Attachment.created_at.desc())
-        .first()
-    )
-    if attachment:
-        attachment.path = path
-        attachment.type = ext
-        conv.updated_at = datetime.utcnow()
-        if not conv.use_docs_default:
-            conv.use_docs_default = True
-        db.commit()
-        db.refresh(attachment)
-        db.refresh(conv)
-    else:
-        raise HTTPException(status_code=500, detail="Failed to persist attachment.")
 
-    return serialize_attachment(attachment)
+@app.post("/conversations/{conversation_id}/attachments:batch")
+def upload_attachments(
+    conversation_id: int,
+    files: List[UploadFile] = File(...),
+    db: Session = Depends(get_db),
+):
+    user_id = current_user_id()
+    conv = ensure_conversation(db, conversation_id, user_id)
+    uploads = [(f.filename, f.content_type, f.file) for f in files]
+    attachments, errors = store_attachments(db, conv, user_id, uploads)
+    return {
+        "attachments": [serialize_attachment(a) for a in attachments],
+        "errors": errors,
+    }
 
 
 @app.get("/attachments/{attachment_id}/content")
@@ -962,7 +1377,6 @@ def get_settings(db: Session = Depends(get_db)):
         settings = UserSettings(user_id=user_id, theme=None, use_docs_default=True)
         db.add(settings)
         db.commit()
-        db.refresh(settings)
     return {
         "theme": settings.theme,
         "useDocs": bool(settings.use_docs_default),
@@ -983,7 +1397,6 @@ def update_settings(payload: Dict = Body(...), db: Session = Depends(get_db)):
         settings.use_docs_default = bool(payload.get("useDocs"))
 
     db.commit()
-    db.refresh(settings)
     return {
         "theme": settings.theme,
         "useDocs": bool(settings.use_docs_default),
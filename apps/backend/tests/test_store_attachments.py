@@ -0,0 +1,99 @@
+# Run from the repo root: PYTHONPATH=apps python -m pytest apps/backend/tests
+import hashlib
+import io
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import backend.main as main
+from backend.app.db import Base
+from backend.app.models import Attachment, Conversation, User
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, expire_on_commit=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def _sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_reupload_keeps_its_path_from_same_name_new_file(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "RAW_DATA_DIR", str(tmp_path))
+
+    user = User(external_id="t", email="t@t")
+    db.add(user)
+    db.flush()
+    conv = Conversation(user_id=user.id, title="t")
+    db.add(conv)
+    db.flush()
+
+    conv_dir = os.path.join(str(tmp_path), str(user.id), str(conv.id))
+    os.makedirs(conv_dir)
+    old_path = os.path.join(conv_dir, "notes.txt")
+    with open(old_path, "wb") as f:
+        f.write(b"old")
+    db.add(
+        Attachment(
+            user_id=user.id,
+            conversation_id=conv.id,
+            name="notes.txt",
+            type="txt",
+            path=old_path,
+            file_hash=_sha(b"old"),
+        )
+    )
+    db.commit()
+
+    # The existing file counts as already embedded; new files get a row on ingest.
+    monkeypatch.setattr(
+        main,
+        "ingested_file_hashes",
+        lambda _db, _cid, hashes: {h for h in hashes if h == _sha(b"old")},
+    )
+
+    def fake_ingest(paths, conversation_id, user_id, mime_types, attachment_types, file_hashes):
+        for path, file_hash in zip(paths, file_hashes):
+            db.add(
+                Attachment(
+                    user_id=user_id,
+                    conversation_id=conversation_id,
+                    name=os.path.basename(path),
+                    path=path,
+                    file_hash=file_hash,
+                )
+            )
+        db.flush()
+
+    monkeypatch.setattr(main, "ingest_files", fake_ingest)
+
+    attachments, errors = main.store_attachments(
+        db,
+        conv,
+        user.id,
+        [
+            ("notes.txt", "text/plain", io.BytesIO(b"old")),
+            ("notes.txt", "text/plain", io.BytesIO(b"new")),
+        ],
+    )
+
+    assert errors == []
+    assert len(attachments) == 2
+    by_hash = {a.file_hash: a for a in attachments}
+    assert by_hash[_sha(b"old")].path == old_path
+    new_path = by_hash[_sha(b"new")].path
+    assert new_path != old_path
+    with open(old_path, "rb") as f:
+        assert f.read() == b"old"
+    with open(new_path, "rb") as f:
+        assert f.read() == b"new"
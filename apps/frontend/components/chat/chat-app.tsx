@@ -19,7 +19,7 @@ import {
   postJson,
   putJson,
   streamSSE,
-  uploadFile
+  uploadFiles
 } from "@/lib/api";
 
 export type Message = {
@@ -196,6 +196,10 @@ export default function ChatApp() {
 
   const [conversations, setConversations] = React.useState<Conversation[]>([]);
   const [activeId, setActiveId] = React.useState<string | null>(null);
+  // Conversations whose messages/attachments are already in state. Local
+  // sends, uploads and deletes keep them current, so switching back to one
+  // does not refetch (or replace message objects and re-render every bubble).
+  const loadedDetailsRef = React.useRef<Set<string>>(new Set());
   const [useDocsByConversation, setUseDocsByConversation] = React.useState<
     Record<string, boolean>
   >({});
@@ -209,9 +213,11 @@ export default function ChatApp() {
   const abortControllersRef = React.useRef<Record<string, AbortController>>({});
   const abortRequestedRef = React.useRef<Record<string, boolean>>({});
 
-  const activeConversation = conversations.find(
-    (conversation) => conversation.id === activeId
+  const conversationsById = React.useMemo(
+    () => new Map(conversations.map((conversation) => [conversation.id, conversation])),
+    [conversations]
   );
+  const activeConversation = activeId ? conversationsById.get(activeId) : undefined;
   const pinnedConversations = React.useMemo(
     () => sortPinnedConversations(conversations),
     [conversations]
@@ -341,19 +347,17 @@ export default function ChatApp() {
     try {
       const data = await postJson<BackendConversation>("/conversations");
       const newConversation = normalizeConversation(data);
+      // A new conversation has no messages or attachments to fetch.
+      loadedDetailsRef.current.add(newConversation.id);
       setConversations((prev) => [newConversation, ...prev]);
       setActiveId(newConversation.id);
-      await Promise.all([
-        loadMessages(newConversation.id),
-        loadAttachments(newConversation.id)
-      ]);
       setIsSidebarOpen(false);
     } catch (error) {
       reportApiError("POST /conversations", error);
       showToast("Unable to create a new conversation.");
       console.error(error);
     }
-  }, [loadAttachments, loadMessages, reportApiError, showToast]);
+  }, [reportApiError, showToast]);
 
   const handleRetryLoad = React.useCallback(async () => {
     setInitialLoadFailed(false);
@@ -402,38 +406,39 @@ export default function ChatApp() {
       [conversationId]: true
     }));
 
-    const uploads = Array.from(files).map(async (file) => {
-      try {
-        const data = await uploadFile<BackendAttachment>(
-          `/conversations/${conversationId}/attachments`,
-          file
+    try {
+      const data = await uploadFiles<{
+        attachments: BackendAttachment[];
+        errors: { filename: string; detail: string }[];
+      }>(`/conversations/${conversationId}/attachments:batch`, Array.from(files));
+      const uploaded = data.attachments.map(normalizeAttachment);
+      updateConversation(conversationId, (conversation) => {
+        const knownIds = new Set(
+          conversation.attachments.map((item) => item.id)
+        );
+        const added = uploaded.filter((item) => !knownIds.has(item.id));
+        return {
+          ...conversation,
+          attachments: [...added, ...conversation.attachments],
+          lastUpdatedAt: new Date().toISOString()
+        };
+      });
+      // Rejected files don't fail the batch; the rest are already stored.
+      if (data.errors.length === 1) {
+        const [rejected] = data.errors;
+        showToast(`${rejected.filename}: ${rejected.detail}`);
+      } else if (data.errors.length > 1) {
+        showToast(
+          `Not uploaded: ${data.errors.map((item) => item.filename).join(", ")}`
         );
-        const attachment = normalizeAttachment(data);
-        updateConversation(conversationId, (conversation) => {
-          const exists = conversation.attachments.some(
-            (item) => item.id === attachment.id
-          );
-          const attachments = exists
-            ? conversation.attachments
-            : [attachment, ...conversation.attachments];
-          return {
-            ...conversation,
-            attachments,
-            lastUpdatedAt: new Date().toISOString()
-          };
-        });
-      } catch (error) {
-        if (error instanceof ApiError && error.status === 400) {
-          showToast(error.message || "Attachment limit reached.");
-        } else {
-          showToast("Unable to upload attachment.");
-        }
-        console.error(error);
       }
-    });
-
-    try {
-      await Promise.all(uploads);
+    } catch (error) {
+      if (error instanceof ApiError && error.status === 400) {
+        showToast(error.message || "Attachment limit reached.");
+      } else {
+        showToast("Unable to upload attachment.");
+      }
+      console.error(error);
     } finally {
       setUploadingByConversation((prev) => ({
         ...prev,
@@ -789,6 +794,7 @@ export default function ChatApp() {
     }
 
     setConversations((prev) => prev.filter((conversation) => conversation.id !== id));
+    loadedDetailsRef.current.delete(id);
 
     if (activeId === id) {
       const remaining = conversations.filter((conversation) => conversation.id !== id);
@@ -890,11 +896,12 @@ export default function ChatApp() {
   }, [selectedModel, mounted]);
 
   React.useEffect(() => {
-    if (!activeId) return;
+    if (!activeId || loadedDetailsRef.current.has(activeId)) return;
     let isActive = true;
     const load = async () => {
       try {
         await Promise.all([loadMessages(activeId), loadAttachments(activeId)]);
+        loadedDetailsRef.current.add(activeId);
       } catch (error) {
         if (isActive) {
           showToast("Unable to load conversation details.");
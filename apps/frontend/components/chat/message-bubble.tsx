@@ -1,5 +1,6 @@
 "use client";
 
+import * as React from "react";
 import ReactMarkdown from "react-markdown";
 import remarkGfm from "remark-gfm";
 import { Bot, User } from "lucide-react";
@@ -10,7 +11,28 @@ type MessageBubbleProps = {
   message: Message;
 };
 
-export default function MessageBubble({ message }: MessageBubbleProps) {
+// Stable plugin list: a fresh array each render makes react-markdown rebuild
+// its processor.
+const REMARK_PLUGINS = [remarkGfm];
+
+// Parses markdown only when the text changes, not when the surrounding bubble
+// re-renders for streaming/evidence/latency updates.
+const MarkdownContent = React.memo(function MarkdownContent({
+  content
+}: {
+  content: string;
+}) {
+  return (
+    <ReactMarkdown
+      remarkPlugins={REMARK_PLUGINS}
+      className="prose prose-sm max-w-none break-words prose-pre:whitespace-pre-wrap prose-pre:break-words prose-pre:overflow-x-hidden"
+    >
+      {content}
+    </ReactMarkdown>
+  );
+});
+
+function MessageBubble({ message }: MessageBubbleProps) {
   const isUser = message.role === "user";
   const evidenceItems =
     !isUser && message.useDocs
@@ -56,12 +78,7 @@ export default function MessageBubble({ message }: MessageBubbleProps) {
           ) : null}
         </div>
         {message.content ? (
-          <ReactMarkdown
-            remarkPlugins={[remarkGfm]}
-            className="prose prose-sm max-w-none break-words prose-pre:whitespace-pre-wrap prose-pre:break-words prose-pre:overflow-x-hidden"
-          >
-            {message.content}
-          </ReactMarkdown>
+          <MarkdownContent content={message.content} />
         ) : (
           <div className="flex items-center gap-2 text-muted">
             <span className="inline-flex h-2 w-2 animate-pulse rounded-full bg-accent-strong" />
@@ -118,3 +135,7 @@ export default function MessageBubble({ message }: MessageBubbleProps) {
     </div>
   );
 }
+
+// Finished messages keep their object identity while a reply streams, so only
+// the streaming bubble re-renders (and re-parses markdown) on each delta.
+export default React.memo(MessageBubble);
@@ -118,6 +118,20 @@ export const uploadFile = async <T>(
   });
 };
 
+export const uploadFiles = async <T>(
+  path: string,
+  files: File[],
+  init?: RequestInit
+) => {
+  const formData = new FormData();
+  files.forEach((file) => formData.append("files", file));
+  return requestJson<T>(path, {
+    ...init,
+    method: "POST",
+    body: formData
+  });
+};
+
 export const getText = async (path: string, init?: RequestInit) => {
   const response = await fetch(buildUrl(path), withDefaults(init));
   if (!response.ok) {